@@ -0,0 +1,18 @@
+"""
+ASGI config for backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# leaves the sync only middleware out, see WSGI_ONLY_MIDDLEWARE in settings
+os.environ.setdefault("DJANGO_ASGI", "true")
+
+application = get_asgi_application()
@@ -0,0 +1,21 @@
+"""
+Benchmarks for the pug or ugh api.
+
+Run them from the backend directory, e.g. `python -m benchmarks.status_queries`.
+They run against a throwaway test database, so the development database is never touched.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    """Configure django the same way manage.py does."""
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+    import django
+    django.setup()
@@ -0,0 +1,255 @@
+"""
+Load test of the swipe endpoints against gunicorn.
+
+Starts gunicorn with gunicorn/prod.py once per worker mode, then has a number of
+concurrent clients sign up, set their preferences and swipe through dogs (get the
+next undecided dog, like or dislike it, repeat) for a fixed time. Prints throughput
+and latency percentiles per mode and endpoint, e.g.
+
+    python -m benchmarks.loadtest --modes sync gthread asgi --clients 32 --duration 20
+
+The asgi mode runs uvicorn workers and swipes through the async endpoints under /api/async/.
+"""
+import argparse
+from collections import defaultdict
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from benchmarks import BACKEND_DIR
+
+GUNICORN_CONFIG = os.path.join(os.path.dirname(BACKEND_DIR), 'gunicorn', 'prod.py')
+
+# mode -> (gunicorn worker class, prefix of the swipe endpoints)
+MODES = {
+    'sync': ('sync', '/api'),
+    'gthread': ('gthread', '/api'),
+    'asgi': ('uvicorn.workers.UvicornWorker', '/api/async'),
+}
+
+# query count in the Server-Timing header sent when METRICS_SERVER_TIMING is on
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Client:
+    """
+    A keep-alive http client that records the latency of every request by endpoint,
+    and the database queries the server reports in its Server-Timing header.
+    """
+
+    def __init__(self, host, port, swipe_prefix='/api'):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.swipe_prefix = swipe_prefix
+        self.token = None
+        self.timings = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.errors = 0
+
+    def request(self, endpoint, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = 'Token ' + self.token
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, json.dumps(body) if body is not None else None,
+                                    headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.errors += 1
+            return None, None
+        self.timings[endpoint].append(time.perf_counter() - started)
+
+        match = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing') or '')
+        if match:
+            self.queries[endpoint] += int(match.group(1))
+        if response.status >= 500:
+            self.errors += 1
+        try:
+            return response.status, json.loads(content) if content else None
+        except ValueError:
+            return response.status, None
+
+    def sign_up(self):
+        credentials = {'username': 'load-' + uuid.uuid4().hex, 'password': 'load-test'}
+
+        self.request('register', 'POST', '/api/user/', credentials)
+        status, data = self.request('login', 'POST', '/api/user/login/', credentials)
+        self.token = data['token']
+        self.request('preferences', 'PUT', '/api/user/preferences/', {
+            'gender': 'm,f,u', 'age': 'b,y,a,s', 'size': 's,m,l,xl,u', 'behavioral_assessment_required': False,
+        })
+
+    def swipe(self, deadline):
+        """Swipe through undecided dogs until the deadline, starting over when none are left."""
+
+        dog_id = -1
+        rated = []
+        while time.monotonic() < deadline:
+            status, dog = self.request('next', 'GET', '%s/dog/%d/undecided/next/' % (self.swipe_prefix, dog_id))
+
+            if status == 404:
+                # every dog was rated, put them back to undecided and start over
+                self.request('reset', 'POST', '/api/dogs/ratings/',
+                             [{'dog': pk, 'status': 'undecided'} for pk in rated])
+                dog_id, rated = -1, []
+                continue
+            if status != 200:
+                continue
+
+            dog_id = dog['id']
+            self.request('rate', 'PUT', '%s/dog/%d/%s/' % (
+                self.swipe_prefix, dog_id, random.choice(('liked', 'disliked'))))
+            rated.append(dog_id)
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+
+
+def summarize(clients, elapsed):
+    """Throughput and latency percentiles for every endpoint of a run."""
+
+    timings = defaultdict(list)
+    queries = defaultdict(int)
+    for client in clients:
+        for endpoint, endpoint_timings in client.timings.items():
+            timings[endpoint].extend(endpoint_timings)
+        for endpoint, endpoint_queries in client.queries.items():
+            queries[endpoint] += endpoint_queries
+
+    report = {'requests': sum(map(len, timings.values())),
+              'requests_per_second': sum(map(len, timings.values())) / elapsed,
+              'errors': sum(client.errors for client in clients),
+              'db_queries': sum(queries.values()),
+              'endpoints': {}}
+    for endpoint, endpoint_timings in sorted(timings.items()):
+        endpoint_timings.sort()
+        report['endpoints'][endpoint] = {
+            'requests': len(endpoint_timings),
+            'mean_ms': statistics.mean(endpoint_timings) * 1000,
+            'p50_ms': percentile(endpoint_timings, 0.50),
+            'p95_ms': percentile(endpoint_timings, 0.95),
+            'p99_ms': percentile(endpoint_timings, 0.99),
+            'db_queries': queries[endpoint],
+        }
+
+    return report
+
+
+def run_load(host, port, clients, duration, swipe_prefix='/api'):
+    """Run the swipe workflow with concurrent clients and return the summary."""
+
+    swipers = [Client(host, port, swipe_prefix) for _ in range(clients)]
+    for swiper in swipers:
+        swiper.sign_up()
+        swiper.timings.clear()
+        swiper.queries.clear()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=swiper.swipe, args=(started + duration,)) for swiper in swipers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize(swipers, time.monotonic() - started)
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+
+    raise RuntimeError('gunicorn did not start listening on %s:%d' % (host, port))
+
+
+def start_gunicorn(worker_class, port, workers=None, extra_env=None, verbose=False):
+    """Start gunicorn with the production profile, extra_env can point it at other settings."""
+
+    env = dict(os.environ, GUNICORN_BIND='127.0.0.1:%d' % port, GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_LOGLEVEL='warning', GUNICORN_ACCESSLOG='/dev/null', **(extra_env or {}))
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+
+    output = None if verbose else subprocess.DEVNULL
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONFIG], env=env,
+                              stdout=output, stderr=output)
+    try:
+        wait_for_port('127.0.0.1', port)
+    except RuntimeError:
+        server.terminate()
+        raise
+
+    return server
+
+
+def prepare_database():
+    """Migrate the database and import the sample dogs if there are none yet."""
+
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=BACKEND_DIR, check=True)
+    has_dogs = subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-c',
+         'import sys; from pugorugh.models import Dog; sys.exit(0 if Dog.objects.exists() else 1)'],
+        cwd=BACKEND_DIR).returncode == 0
+    if not has_dogs:
+        subprocess.run([sys.executable, os.path.join('pugorugh', 'scripts', 'data_import.py')],
+                       cwd=BACKEND_DIR, check=True)
+
+
+def print_report(mode, report):
+    print('%s: %.1f requests/s, %d errors' % (mode, report['requests_per_second'], report['errors']))
+    print('  %-12s %9s %9s %9s %9s %9s' % ('endpoint', 'requests', 'mean ms', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for endpoint, stats in report['endpoints'].items():
+        print('  %-12s %9d %9.2f %9.2f %9.2f %9.2f' % (
+            endpoint, stats['requests'], stats['mean_ms'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['sync', 'gthread', 'asgi'],
+                        help='worker modes to compare')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, help='defaults to the gunicorn/prod.py default')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', action='store_true', help='print the reports as json')
+    parser.add_argument('--verbose', action='store_true', help='show the gunicorn output')
+    args = parser.parse_args()
+
+    prepare_database()
+
+    reports = {}
+    for mode in args.modes:
+        worker_class, swipe_prefix = MODES[mode]
+        server = start_gunicorn(worker_class, args.port, args.workers, verbose=args.verbose)
+        try:
+            reports[mode] = run_load('127.0.0.1', args.port, args.clients, args.duration, swipe_prefix)
+        finally:
+            server.terminate()
+            server.wait()
+
+        if not args.json:
+            print_report(mode, reports[mode])
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Measures what the api fast path saves over running the full middleware stack.
+
+Times token authenticated api requests through the WSGI handler with the fast path on,
+where they skip BROWSER_MIDDLEWARE, and off, where every request runs it. The endpoint
+needs no database queries once the token is cached, so the difference is the middleware.
+Then reports the import time of the apps and middleware only the browser pages need,
+which an api only deployment could drop from its startup, e.g.
+
+    python -m benchmarks.middleware_stack --requests 5000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import BACKEND_DIR, setup_django
+
+# modules loaded for the admin and browser pages only
+BROWSER_MODULES = (
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.sessions',
+    'django.middleware.csrf',
+    'django.middleware.clickjacking',
+)
+
+# loads the app like a wsgi worker does
+STARTUP_SCRIPT = 'from django.core.wsgi import get_wsgi_application; get_wsgi_application()'
+
+
+def time_requests(path, token, requests, fast_path):
+    """Median and mean microseconds per request through a fresh WSGI handler."""
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import RequestFactory, override_settings
+
+    prefixes = ['/api/'] if fast_path else []
+    environ = RequestFactory().get(path, HTTP_AUTHORIZATION='Token ' + token, SERVER_NAME='localhost').environ
+
+    with override_settings(API_FAST_PATH_PREFIXES=prefixes, ALLOWED_HOSTS=['localhost']):
+        handler = WSGIHandler()
+        timings = []
+        for index in range(requests + 100):
+            started = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            response.close()
+            # the first requests fill the caches
+            if index >= 100:
+                timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings) * 1e6, statistics.mean(timings) * 1e6
+
+
+def browser_import_time():
+    """Milliseconds spent importing BROWSER_MODULES, and loading the app, in a new process."""
+
+    from pugorugh.startup import parse_import_times
+
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT], cwd=BACKEND_DIR,
+                            env=dict(os.environ, DJANGO_SETTINGS_MODULE='backend.settings'),
+                            capture_output=True, text=True, check=True)
+    startup = (time.perf_counter() - started) * 1000
+
+    # importtime lists modules before the ones importing them, one level of indent deeper,
+    # so walk it backwards and count a browser module unless one of its importers was counted
+    total = 0
+    importers = []
+    for name, _, cumulative, depth in reversed(parse_import_times(result.stderr)):
+        while importers and importers[-1][0] >= depth:
+            importers.pop()
+        counted = bool(importers) and importers[-1][1]
+        if name.startswith(BROWSER_MODULES) and not counted:
+            total += cumulative
+        importers.append((depth, counted or name.startswith(BROWSER_MODULES)))
+
+    return total / 1000, startup
+
+
+def run(requests):
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+    from pugorugh import models
+
+    old_database = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = models.User.objects.create(username='bench')
+        models.UserPref.objects.create(user=user, gender='m,f', age='b,y', size='s,m')
+        token = Token.objects.create(user=user).key
+
+        print('%-12s %12s %12s' % ('stack', 'median us', 'mean us'))
+        full = time_requests('/api/user/preferences/', token, requests, fast_path=False)
+        print('%-12s %12.1f %12.1f' % ('full', *full))
+        fast = time_requests('/api/user/preferences/', token, requests, fast_path=True)
+        print('%-12s %12.1f %12.1f' % ('fast path', *fast))
+        print('%-12s %12.1f %12.1f' % ('saved', full[0] - fast[0], full[1] - fast[1]))
+    finally:
+        connection.creation.destroy_test_db(old_database, verbosity=0)
+
+    imports, startup = browser_import_time()
+    print()
+    print('app startup %.1f ms, of which %.1f ms import the browser apps and middleware' % (startup, imports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='requests timed per stack')
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Settings of the app under benchmark.
+
+The project settings with the database taken from BENCHMARK_DATABASE_URL, a SQLite file
+in the backend directory by default, so benchmarks never touch the development database.
+Debug is off as in production, and the Server-Timing header reports queries per request.
+"""
+import os
+
+import dj_database_url
+
+from backend.settings import *  # noqa: F401,F403
+from backend.settings import BASE_DIR, DATABASES as PROJECT_DATABASES
+
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(BASE_DIR, 'benchmark.sqlite3')
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    'default': dj_database_url.parse(
+        os.environ.get('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE_URL),
+        conn_max_age=PROJECT_DATABASES['default']['CONN_MAX_AGE'], conn_health_checks=True),
+}
+
+METRICS_SERVER_TIMING = True
+DATABASE_REPLICAS = []
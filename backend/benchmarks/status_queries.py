@@ -0,0 +1,80 @@
+"""
+Shows that status lookups stay flat as the number of users grows.
+
+For every user count the table is grown to that many users, each rating a random
+sample of dogs, then the time of the per-user liked / undecided queries is compared
+with the old query that joined every user's ratings.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def seed(users, dogs, ratings_per_user, start):
+    from pugorugh import models
+
+    new_users = models.User.objects.bulk_create(
+        [models.User(username='bench%d' % index) for index in range(start, users)])
+    models.UserDog.objects.bulk_create([
+        models.UserDog(user=user, dog_id=dog_id, status=random.choice('ld'))
+        for user in new_users
+        for dog_id in random.sample(dogs, ratings_per_user)
+    ], batch_size=5000)
+
+
+def timed(query, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(query())
+        timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings) * 1000
+
+
+def run(user_counts, dog_count, ratings_per_user, repeat):
+    from django.db import connection
+    from pugorugh import models
+
+    old_database = connection.creation.create_test_db(verbosity=0)
+    try:
+        models.Dog.objects.bulk_create([
+            models.Dog(name='Dog %d' % index, image_filename='1.jpg', age=24, gender='f', size='m')
+            for index in range(dog_count)
+        ])
+        dogs = list(models.Dog.objects.values_list('id', flat=True))
+        ratings_per_user = min(ratings_per_user, dog_count)
+
+        print('%8s %14s %14s %14s' % ('users', 'liked ms', 'undecided ms', 'old join ms'))
+        seeded = 0
+        for users in sorted(user_counts):
+            seed(users, dogs, ratings_per_user, seeded)
+            seeded = users
+            user_id = models.User.objects.values_list('id', flat=True).first()
+
+            liked = timed(lambda: models.Dog.objects.with_user_status(user_id, 'l'), repeat)
+            undecided = timed(lambda: models.Dog.objects.with_user_status(user_id, None), repeat)
+            old_join = timed(lambda: models.Dog.objects.filter(userdog__status='l'), repeat)
+
+            print('%8d %14.2f %14.2f %14.2f' % (users, liked, undecided, old_join))
+    finally:
+        connection.creation.destroy_test_db(old_database, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--dogs', type=int, default=500)
+    parser.add_argument('--ratings-per-user', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.users, args.dogs, args.ratings_per_user, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,10 @@ import sys
 
 if __name__ == "__main__":
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    # the development server runs with debug on, other commands like migrate and collectstatic
+    # also run in production, so they keep it off unless DJANGO_DEBUG says otherwise
+    if sys.argv[1:2] == ["runserver"]:
+        os.environ.setdefault("DJANGO_DEBUG", "true")
 
     from django.core.management import execute_from_command_line
 
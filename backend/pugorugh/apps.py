@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PugorughConfig(AppConfig):
     name = 'pugorugh'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        from . import signals  # noqa: F401
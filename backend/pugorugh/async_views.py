@@ -0,0 +1,86 @@
+"""
+Async versions of the swipe endpoints, served without a thread per request under ASGI.
+They answer like DogGetNextView and DogDetailUpdateView.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from . import models
+from . import queues
+from . import serializers
+from .authentication import aauthenticate
+from .counters import dog_views
+
+STATUSES = {'liked': models.UserDog.LIKED, 'disliked': models.UserDog.DISLIKED, 'undecided': None}
+
+
+def error(detail, status, **headers):
+    return JsonResponse({'detail': detail}, status=status, headers=headers)
+
+
+def token_api_view(method):
+    """Only allow the http method and token authenticated users, like the DRF views do."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != method:
+                return error('Method "%s" not allowed.' % request.method, 405, Allow=method)
+
+            request.user = await aauthenticate(request)
+            if request.user is None:
+                return error('Authentication credentials were not provided or are invalid.', 401,
+                             **{'WWW-Authenticate': 'Token'})
+
+            return await view(request, *args, **kwargs)
+
+        # token authenticated like the DRF views, so there is no csrf cookie to check
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+@token_api_view('GET')
+async def dog_next(request, pk, status, format=None):
+    """Get the next dog with the status after the pk given."""
+
+    if status.lower() not in STATUSES:
+        return JsonResponse(['Status was incorrect. Must be liked, disliked, or undecided.'], status=400, safe=False)
+
+    pk = int(pk)
+    status = STATUSES[status.lower()]
+
+    if status is None:
+        # the queue may need building, which queries the database
+        dog_ids = await sync_to_async(queues.get_swipe_queue(request.user.id).next_after)(pk)
+        dog = await models.Dog.objects.filter(id__in=dog_ids).afirst()
+    else:
+        dog = await models.Dog.objects.with_user_status(request.user.id, status).filter(id__gt=pk).afirst()
+
+    if dog is None:
+        return error('Not found.', 404)
+
+    # may flush the views counted so far, which writes to the database
+    await sync_to_async(dog_views.add)([dog.id])
+
+    return JsonResponse(serializers.DogSerializer(dog).data)
+
+
+@token_api_view('PUT')
+async def dog_rate(request, pk, status, format=None):
+    """Set the user's status of a dog."""
+
+    pk = int(pk)
+    status = STATUSES.get(status.lower())
+
+    if not await models.Dog.objects.filter(id=pk).aexists():
+        return JsonResponse({'dog': ['Invalid pk "%d" - object does not exist.' % pk]}, status=400)
+
+    statuses = {pk: status}
+    await models.UserDog.aset_statuses(request.user.id, statuses)
+    await sync_to_async(queues.get_swipe_queue(request.user.id).apply)(statuses)
+
+    return JsonResponse({'status': status, 'dog': pk})
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from . import models
+
+USER_VERSION_KEY = 'pugorugh:user-version:{user_id}'
+
+
+class TTLCache:
+    """A small thread safe LRU whose entries also expire after a number of seconds."""
+
+    def __init__(self, timeout_setting, size_setting, default_timeout=60, default_size=10000):
+        self.timeout_setting = timeout_setting
+        self.size_setting = size_setting
+        self.default_timeout = default_timeout
+        self.default_size = default_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        timeout = getattr(settings, self.timeout_setting, self.default_timeout)
+        max_size = getattr(settings, self.size_setting, self.default_size)
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Delete every entry whose value matches the predicate."""
+
+        with self.lock:
+            for key in [key for key, (expires, value) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# token key -> (user version, (user, token))
+tokens = TTLCache('TOKEN_CACHE_TIMEOUT', 'TOKEN_CACHE_SIZE')
+# user id -> (user version, UserPref)
+user_prefs = TTLCache('TOKEN_CACHE_TIMEOUT', 'TOKEN_CACHE_SIZE')
+
+
+def get_user_version(user_id):
+    """
+    Return the version of what is cached about a user, bumped when their tokens, preferences
+    or account change. It is kept in the default cache, so a change made by one process
+    makes every process drop what it cached for the user.
+    """
+
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # seeded from the clock like the dog version, so an evicted version is never reused
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    try:
+        cache.incr(USER_VERSION_KEY.format(user_id=user_id))
+    except ValueError:
+        get_user_version(user_id)
+
+
+def get_credentials(key):
+    """The cached (user, token) of a token key, or None if it isn't cached or the user changed since."""
+
+    entry = tokens.get(key)
+    if entry is None:
+        return None
+
+    version, credentials = entry
+    if version != get_user_version(credentials[0].pk):
+        tokens.delete(key)
+        return None
+
+    return credentials
+
+
+def set_credentials(key, credentials):
+    tokens.set(key, (get_user_version(credentials[0].pk), credentials))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that remembers token -> user for a short while,
+    so a signed in request doesn't need any authentication queries.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = get_credentials(key)
+
+        if credentials is None:
+            credentials = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            set_credentials(key, credentials)
+
+        return credentials
+
+
+async def aauthenticate(request):
+    """Async token authentication for plain django async views, returns the user or None."""
+
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+
+    credentials = get_credentials(key)
+    if credentials is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+
+        credentials = (token.user, token)
+        set_credentials(key, credentials)
+
+    return credentials[0]
+
+
+def get_user_pref(user_id):
+    """Return a copy of the user's cached preferences, or None if they haven't set any."""
+
+    # read before the preferences, so a change made meanwhile isn't cached as current
+    version = get_user_version(user_id)
+    entry = user_prefs.get(user_id)
+
+    if entry is not None and entry[0] == version:
+        user_pref = entry[1]
+    else:
+        user_pref = models.UserPref.objects.filter(user_id=user_id).first()
+        if user_pref is None:
+            return None
+        user_prefs.set(user_id, (version, user_pref))
+
+    return copy.copy(user_pref)
+
+
+def forget_user(user_id):
+    """
+    Drop everything cached for a user in every process, e.g. after logging out, being
+    deactivated or changing their preferences.
+    """
+
+    tokens.delete_where(lambda entry: entry[1][0].pk == user_id)
+    user_prefs.delete(user_id)
+    bump_user_version(user_id)
+    # and again once committed, in case another process cached the user before the change was
+    transaction.on_commit(lambda: bump_user_version(user_id))
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+DOG_VERSION_KEY = 'pugorugh:dog-version'
+
+
+def get_dog_version():
+    """Return the version of the dog table, bumped whenever a dog changes."""
+
+    version = cache.get(DOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version.
+        cache.add(DOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(DOG_VERSION_KEY)
+    return version
+
+
+def bump_dog_version():
+    """Invalidate everything derived from the dog table."""
+
+    try:
+        return cache.incr(DOG_VERSION_KEY)
+    except ValueError:
+        return get_dog_version()
+
+
+class DogPayloadCache:
+    """
+    Serialized dogs, kept in a bounded in-process LRU and optionally in a shared django cache.
+
+    Entries are keyed by the dog version, so saving or deleting any dog invalidates them.
+    They also expire after DOG_PAYLOAD_CACHE_TIMEOUT seconds, so a process that missed a
+    change, e.g. to a dog updated without saving it, doesn't serve it for good.
+    """
+
+    key_format = 'pugorugh:dog-payload:{version}:{pk}'
+
+    def __init__(self, max_size=None, backend=None):
+        self.max_size = max_size
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        backend = self.backend or getattr(settings, 'DOG_PAYLOAD_CACHE_BACKEND', None)
+        return caches[backend] if backend else None
+
+    def get_many(self, dogs, serialize):
+        """Return the payload of every dog, serializing only the ones that aren't cached."""
+
+        version = get_dog_version()
+        max_size = self.max_size or getattr(settings, 'DOG_PAYLOAD_CACHE_SIZE', 4096)
+        timeout = getattr(settings, 'DOG_PAYLOAD_CACHE_TIMEOUT', 60)
+        keys = [self.key_format.format(version=version, pk=dog.pk) for dog in dogs]
+        payloads = {}
+        now = time.monotonic()
+
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self.entries.move_to_end(key)
+                    payloads[key] = entry[1]
+        cached = set(payloads)
+
+        missing = [(key, dog) for key, dog in zip(keys, dogs) if key not in payloads]
+        shared_cache = self.shared_cache
+
+        if missing and shared_cache is not None:
+            payloads.update(shared_cache.get_many([key for key, dog in missing]))
+            missing = [(key, dog) for key, dog in missing if key not in payloads]
+
+        new_payloads = {key: serialize(dog) for key, dog in missing}
+        if new_payloads and shared_cache is not None:
+            shared_cache.set_many(new_payloads, timeout)
+        payloads.update(new_payloads)
+
+        with self.lock:
+            for key in keys:
+                # entries that were hit keep their expiry time
+                if key not in cached or key not in self.entries:
+                    self.entries[key] = (now + timeout, payloads[key])
+                self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+        # copy so callers can't change the cached payloads
+        return [OrderedDict(payloads[key]) for key in keys]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+dog_payloads = DogPayloadCache()
@@ -0,0 +1,165 @@
+"""
+An optional in-memory catalog of every dog, so reading dogs needs no queries.
+
+Dogs are few and rarely change while every swipe reads them. With DOG_CATALOG on, each
+process loads them once per dog version, which is bumped whenever a dog is saved or
+deleted (see signals.py), so checking the catalog is current is one cache lookup. Dogs
+changed without bumping the version, e.g. with SQL, are picked up once the catalog is
+older than DOG_CATALOG_MAX_AGE seconds. Dogs are
+kept as a sorted array of ids and a row of values per id, along with sets of ids by gender,
+size, age bucket and behavioral assessment, so matching a user's preferences is a few set
+unions and an intersection. Dog instances are built from the rows when they are read.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import models
+from .cache import get_dog_version
+
+INDEXED_FIELDS = ('gender', 'size', 'age_bucket', 'behavioral_assessment')
+
+
+class DogCatalog:
+    """Every dog of one dog version, by id and by the fields preferences match on."""
+
+    __slots__ = ('version', 'loaded', 'field_names', 'ids', 'rows', 'index')
+
+    def __init__(self, version, field_names, rows):
+        # rows are sorted by id, their first value
+        self.version = version
+        self.loaded = time.monotonic()
+        self.field_names = field_names
+        self.ids = array('l', (row[0] for row in rows))
+        self.rows = rows
+
+        self.index = {}
+        for name in INDEXED_FIELDS:
+            position = field_names.index(name)
+            values = {}
+            for row in rows:
+                values.setdefault(row[position], set()).add(row[0])
+            self.index[name] = {value: frozenset(dog_ids) for value, dog_ids in values.items()}
+
+    @classmethod
+    def load(cls, version):
+        field_names = [field.attname for field in models.Dog._meta.concrete_fields]
+        rows = models.Dog.objects.order_by('id').values_list(*field_names).iterator(chunk_size=2000)
+
+        return cls(version, field_names, list(rows))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_current(self, version):
+        return self.version == version and \
+            time.monotonic() - self.loaded < getattr(settings, 'DOG_CATALOG_MAX_AGE', 300)
+
+    def dog(self, index):
+        return models.Dog.from_db(DEFAULT_DB_ALIAS, self.field_names, self.rows[index])
+
+    def get(self, dog_ids):
+        """The dogs with the ids given, in the same order, leaving out the ones that don't exist."""
+
+        dogs = []
+        for dog_id in dog_ids:
+            index = bisect_left(self.ids, dog_id)
+            if index < len(self.ids) and self.ids[index] == dog_id:
+                dogs.append(self.dog(index))
+
+        return dogs
+
+    def matching(self, user_pref):
+        """Ids of the dogs matching the user's preferences."""
+
+        options = (
+            ('gender', user_pref.genders),
+            ('size', user_pref.sizes),
+            ('age_bucket', user_pref.age_buckets),
+            ('behavioral_assessment', [user_pref.behavioral_assessment_required]),
+        )
+
+        dog_ids = None
+        for name, values in options:
+            index = self.index[name]
+            matches = set().union(*(index.get(value, ()) for value in values))
+            dog_ids = matches if dog_ids is None else dog_ids & matches
+
+        return dog_ids
+
+    def all(self):
+        return DogRows(self)
+
+
+class DogRows:
+    """
+    The catalog's dogs in id order, standing in for a queryset of every dog where the
+    views page or stream through them. Only filtering on id is supported.
+    """
+
+    def __init__(self, catalog, start=0, stop=None, reverse=False):
+        self.catalog = catalog
+        self.start = start
+        self.stop = len(catalog) if stop is None else stop
+        self.reverse = reverse
+
+    def order_by(self, *fields):
+        if fields not in (('id',), ('-id',), ('pk',), ('-pk',)):
+            raise ValueError('The dog catalog is ordered by id only, not %s.' % ', '.join(fields))
+
+        return DogRows(self.catalog, self.start, self.stop, fields[0].startswith('-'))
+
+    def filter(self, id__gt=None, id__lt=None):
+        start, stop = self.start, self.stop
+        # cursors hold positions as strings
+        if id__gt is not None:
+            start = max(start, bisect_right(self.catalog.ids, int(id__gt)))
+        if id__lt is not None:
+            stop = min(stop, bisect_left(self.catalog.ids, int(id__lt)))
+
+        return DogRows(self.catalog, start, max(start, stop), self.reverse)
+
+    def indexes(self):
+        return range(self.stop - 1, self.start - 1, -1) if self.reverse else range(self.start, self.stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        return (self.catalog.dog(index) for index in self.indexes())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.catalog.dog(index) for index in self.indexes()[item]]
+
+        return self.catalog.dog(self.indexes()[item])
+
+    def iterator(self, chunk_size=None):
+        return iter(self)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """The catalog of the current dog version, or None when DOG_CATALOG is off."""
+
+    global _catalog
+
+    if not getattr(settings, 'DOG_CATALOG', False):
+        return None
+
+    version = get_dog_version()
+    catalog = _catalog
+    if catalog is None or not catalog.is_current(version):
+        with _catalog_lock:
+            catalog = _catalog
+            if catalog is None or not catalog.is_current(version):
+                catalog = _catalog = DogCatalog.load(version)
+
+    return catalog
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# cache backends whose entries only the process that wrote them sees
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def is_per_process(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PER_PROCESS_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Swipe queues and the dog version are kept in the default cache and changed by every
+    swipe and dog change, so when several processes serve the app they must all read and
+    write the same cache.
+    """
+
+    processes = getattr(settings, 'SERVER_PROCESSES', 1)
+    if processes <= 1 or not is_per_process('default'):
+        return []
+
+    return [Error(
+        'The default cache is kept in each process, but %d processes serve the app, so a swipe, '
+        'preference or dog change in one of them is not seen by the others.' % processes,
+        hint='Set CACHE_URL to a redis server the processes share.',
+        id='pugorugh.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_dog_payload_cache(app_configs, **kwargs):
+    """Several processes share the serialized dogs, so they aren't serialized once per process."""
+
+    processes = getattr(settings, 'SERVER_PROCESSES', 1)
+    backend = getattr(settings, 'DOG_PAYLOAD_CACHE_BACKEND', None)
+    if processes <= 1 or (backend and not is_per_process(backend)):
+        return []
+
+    return [Error(
+        'DOG_PAYLOAD_CACHE_BACKEND has to name a cache the processes share when %d of them serve the app.'
+        % processes,
+        hint="Set CACHE_URL, which makes it 'default', or point it at another shared cache.",
+        id='pugorugh.E002',
+    )]
@@ -0,0 +1,56 @@
+"""
+Dog views counted in memory and added to DogStats in batches.
+
+Counting a view with its own update would add a write to every next dog request, so each
+process sums them up and writes them with one update per batch. Views a worker counted
+since its last flush are lost when it stops.
+"""
+from collections import Counter
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import models
+
+
+class ViewCounter:
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+
+    def add(self, dog_ids):
+        with self.lock:
+            self.counts.update(dog_ids)
+            due = (sum(self.counts.values()) >= getattr(settings, 'DOG_VIEW_FLUSH_SIZE', 100) or
+                   time.monotonic() - self.flushed >= getattr(settings, 'DOG_VIEW_FLUSH_SECONDS', 10))
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.flushed = time.monotonic()
+
+        if not counts:
+            return
+
+        changes = {dog_id: (0, 0, views) for dog_id, views in counts.items()}
+        try:
+            with transaction.atomic():
+                models.DogStats.add(changes)
+        except (DatabaseError, OverflowError):
+            # flushes run in whichever request counted the last view, so a dog id the database
+            # rejects only loses its own views instead of failing that request and the batch
+            for dog_id, change in changes.items():
+                try:
+                    with transaction.atomic():
+                        models.DogStats.add({dog_id: change})
+                except (DatabaseError, OverflowError):
+                    pass
+
+
+dog_views = ViewCounter()
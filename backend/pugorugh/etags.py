@@ -0,0 +1,54 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_dog_version
+
+
+class DogETagMixin:
+    """
+    Strong ETags for views returning dogs.
+
+    The tag is derived from the dog version, the request and the ids of the dogs in the
+    response, so it is known before serializing and a matching If-None-Match gets a 304.
+    """
+
+    def get_etag(self, dogs):
+        key = ':'.join((
+            str(get_dog_version()),
+            self.request.get_full_path(),
+            getattr(self.request, 'accepted_media_type', ''),
+            ','.join(str(dog.pk) for dog in dogs),
+        ))
+        return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+    def is_not_modified(self, etag):
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        return bool(if_none_match) and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*')
+
+    def etag_response(self, dogs, get_response):
+        etag = self.get_etag(dogs)
+
+        if self.is_not_modified(etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = get_response()
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+
+        if page is None:
+            dogs = list(queryset)
+            return self.etag_response(dogs, lambda: Response(self.get_serializer(dogs, many=True).data))
+
+        return self.etag_response(
+            page, lambda: self.get_paginated_response(self.get_serializer(page, many=True).data))
+
+    def retrieve(self, request, *args, **kwargs):
+        dog = self.get_object()
+        return self.etag_response([dog], lambda: Response(self.get_serializer(dog).data))
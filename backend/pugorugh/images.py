@@ -0,0 +1,184 @@
+"""
+Resized WebP variants of the dog photos and BlurHash placeholders.
+
+Variants are written to DOG_IMAGE_VARIANT_ROOT the first time they are requested (or by the
+generate_dog_images command) and served from there afterwards. Placeholders are generated
+along with the variants when a dog is created through the api or imported from a feed.
+"""
+import math
+import os
+import tempfile
+
+from django.conf import settings
+
+# name -> bounding box the photo is shrunk to fit in
+VARIANTS = {
+    'card': (600, 600),
+    'thumbnail': (200, 200),
+}
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def source_path(image_filename, source_root=None):
+    return os.path.join(source_root or settings.DOG_IMAGE_ROOT, os.path.basename(image_filename))
+
+
+def variant_path(image_filename, variant, variant_root=None):
+    return os.path.join(variant_root or settings.DOG_IMAGE_VARIANT_ROOT, variant,
+                        os.path.basename(image_filename) + '.webp')
+
+
+def variant_urls(image_filename):
+    """Urls of every variant of a photo, they are generated when first requested."""
+
+    return {
+        variant: '%s%s/%s.webp' % (settings.DOG_IMAGE_VARIANT_URL, variant, image_filename)
+        for variant in VARIANTS
+    }
+
+
+def open_image(path):
+    # Pillow is only needed to generate variants, so workers don't import it at startup
+    from PIL import Image, ImageOps
+
+    image = Image.open(path)
+    # phone photos are often stored sideways with an orientation tag
+    return ImageOps.exif_transpose(image).convert('RGB')
+
+
+def generate_variant(image_filename, variant, source_root=None, variant_root=None, force=False):
+    """Write a variant of a photo unless an up to date one exists, and return its path."""
+
+    source = source_path(image_filename, source_root)
+    target = variant_path(image_filename, variant, variant_root)
+
+    if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return target
+
+    from PIL import Image
+
+    image = open_image(source)
+    image.thumbnail(VARIANTS[variant], Image.LANCZOS)
+
+    # write to a temporary file first so concurrent requests never serve half a file
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            image.save(file, 'WEBP', quality=80, method=4)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+    return target
+
+
+def encode_base83(value, length):
+    return ''.join(BASE83[value // 83 ** (length - index) % 83] for index in range(1, length + 1))
+
+
+def srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image, components_x=4, components_y=3):
+    """Encode an image as a BlurHash, see https://blurha.sh."""
+
+    # the hash only holds a few colors, a tiny copy of the image gives the same result
+    image = image.copy()
+    image.thumbnail((32, 32))
+    width, height = image.size
+    pixels = [tuple(srgb_to_linear(channel) for channel in pixel) for pixel in image.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(components_x)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(components_y)]
+
+    factors = []
+    for j in range(components_y):
+        for i in range(components_x):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            red = green = blue = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pixel = pixels[y * width + x]
+                    red += basis * pixel[0]
+                    green += basis * pixel[1]
+                    blue += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((red * scale, green * scale, blue * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = encode_base83((components_x - 1) + (components_y - 1) * 9, 1)
+
+    if ac:
+        actual_maximum = max(abs(channel) for factor in ac for channel in factor)
+        quantised_maximum = max(0, min(82, int(actual_maximum * 166 - 0.5)))
+        maximum = (quantised_maximum + 1) / 166
+        result += encode_base83(quantised_maximum, 1)
+    else:
+        maximum = 1
+        result += encode_base83(0, 1)
+
+    result += encode_base83((linear_to_srgb(dc[0]) << 16) + (linear_to_srgb(dc[1]) << 8) + linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        quantised = [max(0, min(18, int(sign_pow(channel / maximum, 0.5) * 9 + 9.5))) for channel in factor]
+        result += encode_base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+
+    return result
+
+
+def process_image(image_filename, source_root, variant_root, force=False):
+    """Generate every variant of a photo and return its BlurHash, safe to run in a worker process."""
+
+    for variant in VARIANTS:
+        generate_variant(image_filename, variant, source_root, variant_root, force)
+
+    return blurhash(open_image(variant_path(image_filename, 'thumbnail', variant_root)))
+
+
+def generate_placeholders(image_filenames, workers=None, force=False):
+    """
+    Generate the variants of photos in parallel and save their BlurHash on the dogs showing
+    them. Photos that don't exist are skipped. Returns the placeholders by image filename.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    from . import models
+    from .cache import bump_dog_version
+
+    image_filenames = [name for name in image_filenames if os.path.isfile(source_path(name))]
+    if not image_filenames:
+        return {}
+
+    process = partial(process_image, source_root=settings.DOG_IMAGE_ROOT,
+                      variant_root=settings.DOG_IMAGE_VARIANT_ROOT, force=force)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        placeholders = dict(zip(image_filenames, executor.map(process, image_filenames, chunksize=4)))
+
+    for image_filename, placeholder in placeholders.items():
+        models.Dog.objects.filter(image_filename=image_filename).exclude(
+            image_placeholder=placeholder).update(image_placeholder=placeholder)
+
+    # update() doesn't send post_save, so invalidate cached dogs by hand
+    bump_dog_version()
+
+    return placeholders
@@ -0,0 +1,47 @@
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from rjsmin import jsmin
+
+# The app's scripts in the order index.html loads them, compiled from static/jsx by babel
+BUNDLE_SOURCES = (
+    'lib/token-auth.js',
+    'js/registration.js',
+    'js/login.js',
+    'js/checkboxGroup.js',
+    'js/preferences.js',
+    'js/dog.js',
+    'js/app.js',
+)
+BUNDLE_NAME = 'js/bundle.min.js'
+
+
+def build_bundle(static_root):
+    """Minify the app's scripts into one file and return its content."""
+
+    parts = []
+    for name in BUNDLE_SOURCES:
+        with open(os.path.join(static_root, name), encoding='utf-8') as file:
+            parts.append(jsmin(file.read()))
+
+    # the files may not end their last statement with a semicolon
+    return ';\n'.join(parts) + ';\n'
+
+
+class Command(BaseCommand):
+    help = 'Minify the compiled scripts of the app into static/%s, run it after compiling the jsx.' % BUNDLE_NAME
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='write the bundle to this file instead')
+
+    def handle(self, *args, **options):
+        static_root = os.path.join(apps.get_app_config('pugorugh').path, 'static')
+        output = options['output'] or os.path.join(static_root, BUNDLE_NAME)
+        bundle = build_bundle(static_root)
+
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(bundle)
+
+        self.stdout.write(self.style.SUCCESS('Wrote %d scripts to %s, %d bytes.' % (
+            len(BUNDLE_SOURCES), output, len(bundle.encode()))))
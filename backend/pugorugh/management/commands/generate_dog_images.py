@@ -0,0 +1,25 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from pugorugh import images
+from pugorugh import models
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants and BlurHash placeholders of every dog photo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='number of processes resizing photos in parallel')
+        parser.add_argument('--force', action='store_true', help='regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        image_filenames = sorted(set(models.Dog.objects.values_list('image_filename', flat=True)))
+        for name in image_filenames:
+            if not os.path.isfile(images.source_path(name)):
+                self.stderr.write('Photo %s does not exist.' % name)
+
+        placeholders = images.generate_placeholders(image_filenames, options['workers'], options['force'])
+
+        self.stdout.write(self.style.SUCCESS('Generated variants of %d photos.' % len(placeholders)))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pugorugh import models
+
+
+class Command(BaseCommand):
+    help = 'Count the likes and dislikes of every dog again from the ratings, e.g. after editing ratings by hand.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='dogs written per query')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = models.DogStats.rebuild(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt the counters of %d dogs in %.2fs.' % (
+            count, time.perf_counter() - started)))
@@ -0,0 +1,59 @@
+from collections import defaultdict
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pugorugh.startup import parse_import_times
+
+# loads the app in a new process the way a gunicorn worker does, and prints how long it took
+STARTUP_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+from backend.{module} import application
+loaded = time.perf_counter()
+from pugorugh.startup import warm_up
+warm_up_seconds = warm_up() if {warm_up} else 0
+print(json.dumps({{'load': loaded - started, 'warm_up': warm_up_seconds}}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Load the app in a new process with python -X importtime and show where its startup time goes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='number of modules and packages listed')
+        parser.add_argument('--asgi', action='store_true', help='load the asgi app instead of the wsgi one')
+        parser.add_argument('--no-warm-up', action='store_true', help="don't time pugorugh.startup.warm_up")
+
+    def handle(self, *args, **options):
+        script = STARTUP_SCRIPT.format(module='asgi' if options['asgi'] else 'wsgi',
+                                       warm_up=not options['no_warm_up'])
+        # the settings module is passed on in the environment
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        if result.returncode:
+            self.stderr.write('\n'.join(line for line in result.stderr.splitlines()
+                                         if not line.startswith('import time:')))
+            return
+
+        timings = json.loads(result.stdout.splitlines()[-1])
+        modules = parse_import_times(result.stderr)
+
+        # self times don't overlap, so they add up by package
+        packages = defaultdict(int)
+        for name, self_time, _, _ in modules:
+            packages[name.split('.')[0]] += self_time
+
+        self.stdout.write('Loaded the app in %.1f ms and warmed it up in %.1f ms, %d modules took %.1f ms to import.' % (
+            timings['load'] * 1000, timings['warm_up'] * 1000, len(modules), sum(packages.values()) / 1000))
+
+        self.stdout.write('\n%-48s %12s' % ('package', 'import ms'))
+        for package, self_time in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write('%-48s %12.1f' % (package, self_time / 1000))
+
+        self.stdout.write('\n%-48s %12s %14s' % ('module', 'self ms', 'cumulative ms'))
+        for name, self_time, cumulative, _ in sorted(modules, key=lambda module: -module[1])[:options['top']]:
+            self.stdout.write('%-48s %12.1f %14.1f' % (name, self_time / 1000, cumulative / 1000))
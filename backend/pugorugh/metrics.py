@@ -0,0 +1,114 @@
+"""
+Per endpoint request metrics in the Prometheus text format.
+
+MetricsMiddleware records every request into `registry`, which the /metrics view renders.
+The registry is per process, so with several gunicorn workers each scrape sees one worker.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # labels -> [count per bucket + one for +Inf, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.documentation), '# TYPE %s histogram' % self.name]
+
+        for labels, (counts, total) in sorted(self.series.items()):
+            label_text = ','.join('%s="%s"' % (key, str(value).replace('"', '\\"')) for key, value in labels)
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('%s_bucket{%sle="%s"} %d' % (self.name, prefix, bound, cumulative))
+            lines.append('%s_sum{%s} %s' % (self.name, label_text, total))
+            lines.append('%s_count{%s} %d' % (self.name, label_text, cumulative))
+
+        return '\n'.join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.request_duration = Histogram(
+                'pugorugh_request_duration_seconds', 'Time spent handling requests.', LATENCY_BUCKETS)
+            self.db_queries = Histogram(
+                'pugorugh_db_queries', 'Database queries run per request.', QUERY_BUCKETS)
+            self.db_duration = Histogram(
+                'pugorugh_db_duration_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS)
+            self.serializer_duration = Histogram(
+                'pugorugh_serializer_duration_seconds', 'Time spent serializing dogs per request.', LATENCY_BUCKETS)
+            self.response_size = Histogram(
+                'pugorugh_response_size_bytes', 'Size of the response bodies.', SIZE_BUCKETS)
+
+    def record(self, view, method, status, request_metrics, duration, size):
+        with self.lock:
+            self.request_duration.observe((('view', view), ('method', method), ('status', status)), duration)
+            self.db_queries.observe((('view', view),), request_metrics.queries)
+            self.db_duration.observe((('view', view),), request_metrics.db_duration)
+            self.serializer_duration.observe((('view', view),), request_metrics.serializer_duration)
+            if size is not None:
+                self.response_size.observe((('view', view),), size)
+
+    def render(self):
+        with self.lock:
+            histograms = (self.request_duration, self.db_queries, self.db_duration,
+                          self.serializer_duration, self.response_size)
+            return '\n'.join(histogram.render() for histogram in histograms) + '\n'
+
+
+class RequestMetrics:
+    """What the request being handled has cost so far."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting the queries and their time."""
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += time.perf_counter() - started
+
+
+registry = Registry()
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the serializer time of the current request."""
+
+    request_metrics = current_request.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if request_metrics is not None:
+            request_metrics.serializer_duration += time.perf_counter() - started
@@ -0,0 +1,254 @@
+from contextlib import ExitStack
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+from . import metrics
+from . import routers
+
+
+class MetricsMiddleware:
+    """
+    Records latency, database queries and time, serializer time and response size of every
+    request by view, see metrics.py. With METRICS_SERVER_TIMING on, the same numbers are
+    sent back in a Server-Timing header to show up in the browser's dev tools.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        started = time.perf_counter()
+
+        try:
+            with self.execute_wrappers(request_metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+
+        return self.record(request, response, request_metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        started = time.perf_counter()
+
+        try:
+            with self.execute_wrappers(request_metrics):
+                response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+
+        return self.record(request, response, request_metrics, time.perf_counter() - started)
+
+    def execute_wrappers(self, request_metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(request_metrics.execute_wrapper))
+        return stack
+
+    def record(self, request, response, request_metrics, duration):
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        metrics.registry.record(view, request.method, response.status_code, request_metrics, duration, size)
+
+        if getattr(settings, 'METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = 'total;dur=%.2f, db;dur=%.2f;desc="%d queries", serializer;dur=%.2f' % (
+                duration * 1000, request_metrics.db_duration * 1000, request_metrics.queries,
+                request_metrics.serializer_duration * 1000)
+
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Reads from the primary database while handling writes, and for REPLICA_PIN_SECONDS
+    after a client's last successful write, otherwise from the read replicas, see routers.py.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not routers.get_replicas():
+            return self.get_response(request)
+
+        key, write, token = self.set_database(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.use_primary.reset(token)
+
+        return self.pin(key, write, response)
+
+    async def __acall__(self, request):
+        if not routers.get_replicas():
+            return await self.get_response(request)
+
+        key, write, token = self.set_database(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.use_primary.reset(token)
+
+        return self.pin(key, write, response)
+
+    def set_database(self, request):
+        key = routers.token_key(request)
+        write = request.method not in SAFE_METHODS
+        token = routers.use_primary.set(write or (key is not None and routers.is_pinned(key)))
+        return key, write, token
+
+    def pin(self, key, write, response):
+        if write and key is not None and response.status_code < 400:
+            routers.pin(key)
+
+        return response
+
+
+def is_api_fast_path(request):
+    """Whether the request is token authenticated and under one of API_FAST_PATH_PREFIXES."""
+
+    prefixes = getattr(settings, 'API_FAST_PATH_PREFIXES', ())
+    return request.path_info.startswith(tuple(prefixes)) and routers.token_key(request) is not None
+
+
+def adapt(function, is_async, to_async):
+    """Make a sync function awaitable or an async one callable, the way django's handler adapts middleware."""
+
+    if to_async and not is_async:
+        return sync_to_async(function, thread_sensitive=True)
+    if is_async and not to_async:
+        return async_to_sync(function)
+    return function
+
+
+class ApiFastPathMiddleware:
+    """
+    Runs the middleware in settings.BROWSER_MIDDLEWARE, sessions, csrf, messages and the
+    like, for every request but the token authenticated ones to the api, which use none
+    of it. Their hooks run as if they were listed in MIDDLEWARE in place of this one.
+    Under ASGI the browser middleware runs async too, so api requests skip it without a
+    thread and browser requests only get one for the middleware that is sync only.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        if self.is_async:
+            markcoroutinefunction(self)
+            # django awaits the hooks of async middleware instead of running them in a thread
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+        handler = convert_exception_to_response(get_response)
+        handler_is_async = self.is_async
+        for middleware_path in reversed(getattr(settings, 'BROWSER_MIDDLEWARE', ())):
+            middleware_class = import_string(middleware_path)
+            # like django, keep the chain in its mode when the middleware supports it
+            if handler_is_async or not getattr(middleware_class, 'sync_capable', True):
+                middleware_is_async = getattr(middleware_class, 'async_capable', False)
+            else:
+                middleware_is_async = False
+
+            try:
+                middleware = middleware_class(adapt(handler, handler_is_async, middleware_is_async))
+            except MiddlewareNotUsed:
+                continue
+
+            # the same order and modes django calls the hooks of MIDDLEWARE in
+            if hasattr(middleware, 'process_view'):
+                self.view_middleware.insert(0, self.adapt_hook(middleware.process_view, self.is_async))
+            if hasattr(middleware, 'process_template_response'):
+                self.template_response_middleware.append(
+                    self.adapt_hook(middleware.process_template_response, self.is_async))
+            if hasattr(middleware, 'process_exception'):
+                self.exception_middleware.append(self.adapt_hook(middleware.process_exception, False))
+            handler = convert_exception_to_response(middleware)
+            handler_is_async = middleware_is_async
+
+        self.browser_handler = adapt(handler, handler_is_async, self.is_async)
+
+    @staticmethod
+    def adapt_hook(hook, to_async):
+        return adapt(hook, iscoroutinefunction(hook), to_async)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        request.api_fast_path = is_api_fast_path(request)
+        if request.api_fast_path:
+            return self.get_response(request)
+
+        return self.browser_handler(request)
+
+    async def __acall__(self, request):
+        request.api_fast_path = is_api_fast_path(request)
+        if request.api_fast_path:
+            return await self.get_response(request)
+
+        return await self.browser_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not request.api_fast_path:
+            for process_view in self.view_middleware:
+                response = process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not request.api_fast_path:
+            for process_view in self.view_middleware:
+                response = await process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+
+    def process_template_response(self, request, response):
+        if not request.api_fast_path:
+            for process_template_response in self.template_response_middleware:
+                response = process_template_response(request, response)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        if not request.api_fast_path:
+            for process_template_response in self.template_response_middleware:
+                response = await process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        # django runs exception middleware sync, under ASGI too
+        if not request.api_fast_path:
+            for process_exception in self.exception_middleware:
+                response = process_exception(request, exception)
+                if response is not None:
+                    return response
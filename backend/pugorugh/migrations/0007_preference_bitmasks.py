@@ -0,0 +1,71 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:23
+
+from django.db import migrations, models
+
+DOG_AGES = {
+    'b': range(0, 7),
+    'y': range(7, 13),
+    'a': range(13, 85),
+    's': range(85, 361),
+}
+GENDER_BITS = {'m': 1, 'f': 2, 'u': 4}
+AGE_BITS = {'b': 1, 'y': 2, 'a': 4, 's': 8}
+SIZE_BITS = {'s': 1, 'm': 2, 'l': 4, 'xl': 8, 'u': 16}
+
+
+def to_mask(options, bits):
+    mask = 0
+    for option in options.split(","):
+        mask |= bits.get(option.strip(), 0)
+    return mask
+
+
+def populate_derived_fields(apps, schema_editor):
+    Dog = apps.get_model('pugorugh', 'Dog')
+    UserPref = apps.get_model('pugorugh', 'UserPref')
+    db_alias = schema_editor.connection.alias
+
+    for age_reference, age_range in DOG_AGES.items():
+        Dog.objects.using(db_alias).filter(age__gte=age_range.start, age__lt=age_range.stop).update(age_bucket=age_reference)
+
+    user_prefs = list(UserPref.objects.using(db_alias).all())
+    for user_pref in user_prefs:
+        user_pref.gender_mask = to_mask(user_pref.gender, GENDER_BITS)
+        user_pref.age_mask = to_mask(user_pref.age, AGE_BITS)
+        user_pref.size_mask = to_mask(user_pref.size, SIZE_BITS)
+    UserPref.objects.using(db_alias).bulk_update(user_prefs, ['gender_mask', 'age_mask', 'size_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0006_auto_20190105_2207'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dog',
+            name='age_bucket',
+            field=models.CharField(editable=False, max_length=1, null=True),
+        ),
+        migrations.AddField(
+            model_name='userpref',
+            name='age_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userpref',
+            name='gender_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userpref',
+            name='size_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='dog',
+            index=models.Index(fields=['gender', 'size', 'age_bucket', 'behavioral_assessment', 'id'], name='dog_preference_match_idx'),
+        ),
+        migrations.RunPython(populate_derived_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:24
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_user_dogs(apps, schema_editor):
+    """Keep only the most recent user dog for every user and dog pair."""
+
+    UserDog = apps.get_model('pugorugh', 'UserDog')
+    user_dogs = UserDog.objects.using(schema_editor.connection.alias)
+
+    latest_ids = user_dogs.values('user', 'dog').annotate(latest_id=Max('id')).values('latest_id')
+    user_dogs.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0007_preference_bitmasks'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_user_dogs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userdog',
+            constraint=models.UniqueConstraint(fields=('user', 'dog'), name='unique_user_dog'),
+        ),
+    ]
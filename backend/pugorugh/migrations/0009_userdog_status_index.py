@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0008_unique_user_dog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userdog',
+            index=models.Index(fields=['user', 'status', 'dog'], name='userdog_user_status_dog_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0009_userdog_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dog',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0010_dog_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dog',
+            name='image_placeholder',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
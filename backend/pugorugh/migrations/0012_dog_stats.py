@@ -0,0 +1,46 @@
+# Generated by Django 4.2.1 on 2026-10-17 18:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_ratings(apps, schema_editor):
+    Dog = apps.get_model('pugorugh', 'Dog')
+    DogStats = apps.get_model('pugorugh', 'DogStats')
+    UserDog = apps.get_model('pugorugh', 'UserDog')
+    db_alias = schema_editor.connection.alias
+
+    counts = {
+        dog_id: (likes, dislikes) for dog_id, likes, dislikes in
+        UserDog.objects.using(db_alias).values_list('dog_id').annotate(
+            likes=models.Count('id', filter=models.Q(status='l')),
+            dislikes=models.Count('id', filter=models.Q(status='d')),
+        ).order_by()
+    }
+    DogStats.objects.using(db_alias).bulk_create([
+        DogStats(dog_id=dog_id, likes=counts.get(dog_id, (0, 0))[0], dislikes=counts.get(dog_id, (0, 0))[1])
+        for dog_id in Dog.objects.using(db_alias).values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pugorugh', '0011_dog_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DogStats',
+            fields=[
+                ('dog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='pugorugh.dog')),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-likes', 'dog'], name='dogstats_likes_idx')],
+            },
+        ),
+        migrations.RunPython(count_ratings, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from django.db import models
-from django.db import IntegrityError
+from django.db import models, transaction
 
 # In months, see https://pets.webmd.com/dogs/life-stages#2
 DOG_AGES = {
@@ -10,6 +10,51 @@ DOG_AGES = {
     's': range(85, 361),
 }
 
+# Bit flags used to store user preferences as compact masks.
+GENDER_BITS = {'m': 1, 'f': 2, 'u': 4}
+AGE_BITS = {'b': 1, 'y': 2, 'a': 4, 's': 8}
+SIZE_BITS = {'s': 1, 'm': 2, 'l': 4, 'xl': 8, 'u': 16}
+
+
+def age_bucket(age):
+    """Return the DOG_AGES key an age in months falls in, or None when out of range."""
+
+    for age_reference, age_range in DOG_AGES.items():
+        if age in age_range:
+            return age_reference
+
+    return None
+
+
+def to_mask(options, bits):
+    """Turn a string of comma-separated options into a bit mask."""
+
+    mask = 0
+    for option in str(options).split(","):
+        mask |= bits.get(option.strip(), 0)
+
+    return mask
+
+
+def from_mask(mask, bits):
+    """Turn a bit mask back into the list of options it contains."""
+
+    return [option for option, bit in bits.items() if mask & bit]
+
+
+class DogQuerySet(models.QuerySet):
+    def with_user_status(self, user_id, status):
+        """
+        Dogs the user gave a status, or hasn't liked or disliked yet when status is None.
+        Uses a per-user EXISTS subquery so other users' ratings are never joined in.
+        """
+
+        user_dogs = UserDog.objects.filter(user_id=user_id, dog=models.OuterRef('pk'))
+
+        if status is None:
+            return self.exclude(models.Exists(user_dogs.filter(status__isnull=False)))
+        return self.filter(models.Exists(user_dogs.filter(status=status)))
+
 
 class Dog(models.Model):
     """A dog that is available for adoption."""
@@ -44,6 +89,26 @@ class Dog(models.Model):
     size = models.CharField(max_length=2, choices=SIZE_CHOICES)
     behavioral_assessment = models.BooleanField(default=False)
     medical_needs = models.TextField(blank=True)
+    # BlurHash of the photo to show while it loads, see images.blurhash.
+    image_placeholder = models.CharField(max_length=100, blank=True)
+    # Key of the dog in the shelter feed it was imported from, so imports can update it.
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # Derived from age so preference matching is an indexed lookup, see DOG_AGES.
+    age_bucket = models.CharField(max_length=1, null=True, editable=False)
+
+    objects = DogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['gender', 'size', 'age_bucket', 'behavioral_assessment', 'id'],
+                name='dog_preference_match_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.age_bucket = age_bucket(self.age)
+        super(Dog, self).save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -63,14 +128,137 @@ class UserDog(models.Model):
     dog = models.ForeignKey('Dog', on_delete=models.CASCADE)
     status = models.CharField(max_length=1, choices=STATUS_CHOICES, null=True)
 
-    def save(self, *args, **kwargs):
-        if self.pk is None:
-            user_dog = UserDog.objects.filter(user=self.user, dog=self.dog)
-            if user_dog.count() != 0:
-                raise IntegrityError(
-                    "UserDog item with same dog field exist on user_dog %r" % user_dog[0].pk
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dog'], name='unique_user_dog'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'status', 'dog'], name='userdog_user_status_dog_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(UserDog, cls).from_db(db, field_names, values)
+        # remember the status loaded, so saving can tell how the dog's counters change
+        instance.loaded_status = instance.__dict__.get('status')
+        return instance
+
+    @classmethod
+    def set_statuses(cls, user_id, statuses):
+        """
+        Insert or update the status of several dogs for a user, and update the counters of
+        the dogs by what changed.
+        """
+
+        user_dogs = [cls(user_id=user_id, dog_id=dog_id, status=status) for dog_id, status in statuses.items()]
+
+        with transaction.atomic():
+            # add the dogs the user hasn't rated yet as undecided, which counts for nothing, so every
+            # row exists and is locked below: a concurrent rating of the same dogs, even a first one,
+            # waits and counts from this one's statuses
+            cls.objects.bulk_create([cls(user_id=user_id, dog_id=dog_id) for dog_id in statuses],
+                                    ignore_conflicts=True)
+            previous = dict(cls.objects.select_for_update().filter(
+                user_id=user_id, dog_id__in=list(statuses)).values_list('dog_id', 'status'))
+            user_dogs = cls.objects.bulk_create(
+                user_dogs,
+                update_conflicts=True,
+                unique_fields=['user', 'dog'],
+                update_fields=['status'],
+            )
+            DogStats.add({
+                dog_id: DogStats.rating_change(previous.get(dog_id), status) for dog_id, status in statuses.items()
+            })
+
+        return user_dogs
+
+    @classmethod
+    async def aset_statuses(cls, user_id, statuses):
+        """Async version of set_statuses."""
+
+        # transactions only work in sync code
+        return await sync_to_async(cls.set_statuses)(user_id, statuses)
+
+
+class DogStats(models.Model):
+    """
+    Like, dislike and view counts of a dog, updated as users rate and see it so they
+    never have to be counted. `python manage.py rebuild_dog_stats` recounts the ratings.
+    """
+
+    dog = models.OneToOneField('Dog', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+    views = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes', 'dog'], name='dogstats_likes_idx'),
+        ]
+
+    @staticmethod
+    def rating_change(previous_status, status):
+        """The (likes, dislikes, views) to add when a rating goes from one status to another."""
+
+        return (
+            (status == UserDog.LIKED) - (previous_status == UserDog.LIKED),
+            (status == UserDog.DISLIKED) - (previous_status == UserDog.DISLIKED),
+            0,
+        )
+
+    @classmethod
+    def add(cls, changes):
+        """
+        Add to the counters of dogs with a single update, changes maps dog ids
+        to the (likes, dislikes, views) to add.
+        """
+
+        changes = {dog_id: change for dog_id, change in changes.items() if any(change)}
+        if not changes:
+            return
+
+        counters = {}
+        for index, name in enumerate(('likes', 'dislikes', 'views')):
+            whens = [models.When(dog_id=dog_id, then=models.Value(change[index]))
+                     for dog_id, change in changes.items() if change[index]]
+            if whens:
+                counters[name] = models.F(name) + models.Case(*whens, default=models.Value(0))
+
+        updated = cls.objects.filter(dog_id__in=list(changes)).update(**counters)
+
+        if updated < len(changes):
+            # dogs without counters yet, e.g. created before they existed
+            existing = cls.objects.filter(dog_id__in=list(changes)).values_list('dog_id', flat=True)
+            missing = Dog.objects.filter(id__in=list(changes)).exclude(id__in=existing).values_list('id', flat=True)
+            cls.objects.bulk_create([
+                cls(dog_id=dog_id, **{name: max(value, 0) for name, value in zip(('likes', 'dislikes', 'views'),
+                                                                                 changes[dog_id])})
+                for dog_id in missing
+            ], ignore_conflicts=True)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Count the likes and dislikes of every dog again from the ratings, keeping the views."""
+
+        counts = {
+            dog_id: (likes, dislikes) for dog_id, likes, dislikes in UserDog.objects.values_list('dog_id').annotate(
+                likes=models.Count('id', filter=models.Q(status=UserDog.LIKED)),
+                dislikes=models.Count('id', filter=models.Q(status=UserDog.DISLIKED)),
+            ).order_by()
+        }
+        dog_ids = list(Dog.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(dog_ids), batch_size):
+            with transaction.atomic():
+                cls.objects.bulk_create(
+                    [cls(dog_id=dog_id, likes=counts.get(dog_id, (0, 0))[0], dislikes=counts.get(dog_id, (0, 0))[1])
+                     for dog_id in dog_ids[start:start + batch_size]],
+                    update_conflicts=True,
+                    unique_fields=['dog'],
+                    update_fields=['likes', 'dislikes'],
                 )
-        super(UserDog, self).save(*args, **kwargs)
+
+        return len(dog_ids)
 
 
 class UserPref(models.Model):
@@ -84,16 +272,30 @@ class UserPref(models.Model):
     size = models.CharField(max_length=15)
     behavioral_assessment_required = models.BooleanField(default=False)
 
+    # Bit masks of the options above, kept in sync on save so matching doesn't parse strings.
+    gender_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    age_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    size_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.gender_mask = to_mask(self.gender, GENDER_BITS)
+        self.age_mask = to_mask(self.age, AGE_BITS)
+        self.size_mask = to_mask(self.size, SIZE_BITS)
+        super(UserPref, self).save(*args, **kwargs)
+
     @property
-    def ages_int_range(self):
-        """Takes an age given and translates it to a year range"""
+    def genders(self):
+        return from_mask(self.gender_mask, GENDER_BITS)
 
-        ages = []
-        for age_reference, age_range in DOG_AGES.items():
-            if age_reference in self.age:
-                ages.extend(age_range)
+    @property
+    def age_buckets(self):
+        """Age buckets of DOG_AGES the user is interested in."""
+
+        return from_mask(self.age_mask, AGE_BITS)
 
-        return ages
+    @property
+    def sizes(self):
+        return from_mask(self.size_mask, SIZE_BITS)
 
     def __str__(self):
         return self.user.username
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class DogCursorPagination(CursorPagination):
+    """Keyset pagination on dog id, stable while new dogs are being inserted."""
+
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        # the default is read per request, so changes to the setting apply
+        self.page_size = getattr(settings, 'DOG_LIST_PAGE_SIZE', 100)
+        return super().get_page_size(request)
+
+
+class StreamingListMixin:
+    """
+    Stream the whole list instead of a page when `?stream=json` or `?stream=ndjson` is given.
+
+    Rows are read from the database in chunks and serialized one at a time,
+    so memory stays flat no matter how many dogs there are.
+    """
+
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get('stream')
+
+        if stream == 'ndjson':
+            rows = self.stream_ndjson(self.get_stream_queryset())
+            return StreamingHttpResponse(rows, content_type='application/x-ndjson')
+        if stream == 'json':
+            rows = self.stream_json(self.get_stream_queryset())
+            return StreamingHttpResponse(rows, content_type='application/json')
+
+        return super().list(request, *args, **kwargs)
+
+    def get_stream_queryset(self):
+        return self.filter_queryset(self.get_queryset()).order_by('id')
+
+    def serialize_rows(self, queryset):
+        serializer = self.get_serializer()
+        encoder = JSONEncoder()
+
+        for instance in queryset.iterator(chunk_size=self.stream_chunk_size):
+            yield encoder.encode(serializer.to_representation(instance))
+
+    def stream_ndjson(self, queryset):
+        for row in self.serialize_rows(queryset):
+            yield row + '\n'
+
+    def stream_json(self, queryset):
+        separator = '['
+        for row in self.serialize_rows(queryset):
+            yield separator + row
+            separator = ','
+
+        yield '[]' if separator == '[' else ']'
@@ -0,0 +1,114 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import models
+from .authentication import get_user_pref
+from .cache import get_dog_version
+from .catalog import get_catalog
+
+QUEUE_KEY = 'pugorugh:swipe-queue:{version}:{user_id}'
+
+
+class SwipeQueue:
+    """
+    Ordered ids of the dogs a user has not rated yet that match their preferences.
+
+    The queue is built with a single query the first time it is needed and kept in the
+    cache, so getting the next dog is a binary search instead of a filtered join.
+    Swiping removes the dog from the queue, while preference or dog changes throw it away.
+    """
+
+    # whether the queue is in ranked order rather than by id
+    ranked = False
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    @property
+    def key(self):
+        return QUEUE_KEY.format(version=get_dog_version(), user_id=self.user_id)
+
+    def build(self):
+        """Query the ids of the undecided dogs that match the user's preferences."""
+
+        user_pref = get_user_pref(self.user_id)
+        if user_pref is None:
+            return array('l')
+
+        catalog = get_catalog()
+        if catalog is not None:
+            # match in memory, only the user's ratings are queried
+            rated = models.UserDog.objects.filter(user_id=self.user_id, status__isnull=False)
+            dog_ids = catalog.matching(user_pref).difference(rated.values_list('dog_id', flat=True))
+            return array('l', sorted(dog_ids))
+
+        dog_ids = models.Dog.objects.with_user_status(self.user_id, None).filter(
+            gender__in=user_pref.genders,
+            size__in=user_pref.sizes,
+            age_bucket__in=user_pref.age_buckets,
+            behavioral_assessment=user_pref.behavioral_assessment_required,
+        ).order_by('id').values_list('id', flat=True)
+
+        return array('l', dog_ids)
+
+    def ids(self):
+        key = self.key
+        dog_ids = cache.get(key)
+
+        if dog_ids is None:
+            dog_ids = self.build()
+            cache.set(key, dog_ids, getattr(settings, 'SWIPE_QUEUE_TIMEOUT', 300))
+
+        return dog_ids
+
+    def next_after(self, pk, count=1):
+        """Return the ids of the next count queued dogs after pk, fewer at the end of the queue."""
+
+        dog_ids = self.ids()
+        index = bisect_right(dog_ids, pk)
+
+        return dog_ids[index:index + count].tolist()
+
+    def discard(self, *dog_ids_to_remove):
+        """Remove dogs from the queue once they have been rated."""
+
+        key = self.key
+        dog_ids = cache.get(key)
+
+        if dog_ids is None:
+            return
+
+        changed = False
+        for dog_id in dog_ids_to_remove:
+            index = bisect_left(dog_ids, dog_id)
+            if index < len(dog_ids) and dog_ids[index] == dog_id:
+                del dog_ids[index]
+                changed = True
+
+        if changed:
+            cache.set(key, dog_ids, getattr(settings, 'SWIPE_QUEUE_TIMEOUT', 300))
+
+    def apply(self, statuses):
+        """Update the queue after the statuses of some dogs were set, keyed by dog id."""
+
+        if None in statuses.values():
+            # undecided dogs go back into the queue, so rebuild it
+            self.invalidate()
+        else:
+            self.discard(*statuses)
+
+    def invalidate(self):
+        cache.delete(self.key)
+
+
+def get_swipe_queue(user_id):
+    """The user's swipe queue, in the order of settings.DOG_RANKER when one is set."""
+
+    if getattr(settings, 'DOG_RANKER', None):
+        from .ranking import RankedSwipeQueue
+        return RankedSwipeQueue(user_id)
+
+    return SwipeQueue(user_id)
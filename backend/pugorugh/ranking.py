@@ -0,0 +1,283 @@
+"""
+Ranks the dogs in a user's swipe queue by how likely the user is to like them.
+
+Every dog is a row of a few column arrays (breed and size codes, popularity across users
+and recency), loaded once per process and dog version. A user's affinity for a breed or a
+size is the number of dogs of it they liked minus the ones they disliked, smoothed by how
+many they rated, so scoring any number of dogs is a handful of vectorized NumPy operations.
+
+Rankers are pluggable, set DOG_RANKER to the dotted path of a Ranker subclass.
+"""
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+import numpy as np
+
+from . import models
+from .cache import get_dog_version
+from .queues import SwipeQueue
+
+RANKED_QUEUE_KEY = 'pugorugh:ranked-queue:{version}:{user_id}'
+RANKER_STATE_KEY = 'pugorugh:ranker-state:{version}:{user_id}'
+
+DEFAULT_WEIGHTS = {'affinity': 1.0, 'popularity': 0.5, 'recency': 0.1}
+# liked and disliked dogs count for and against their breed and size
+RATING_VALUES = {'l': 1.0, 'd': -1.0}
+
+
+class Candidates:
+    """Every dog as column arrays, sorted by id, for scoring."""
+
+    def __init__(self, version, ids, breeds, sizes, popularity):
+        self.version = version
+        self.ids = ids
+        self.breeds = breeds
+        self.sizes = sizes
+        self.popularity = popularity
+        # dogs listed later have higher ids
+        self.recency = np.linspace(0, 1, len(ids), dtype=np.float32)
+        self.expires = time.monotonic() + getattr(settings, 'DOG_RANKING_REFRESH', 300)
+        self.breed_count = int(breeds.max()) + 1 if len(breeds) else 0
+        self.size_count = len(models.Dog.SIZE_CHOICES)
+
+    @classmethod
+    def load(cls, version):
+        size_codes = {choice[0]: code for code, choice in enumerate(models.Dog.SIZE_CHOICES)}
+        rows = list(models.Dog.objects.order_by('id').values_list('id', 'breed', 'size'))
+        breed_codes = {}
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        breeds = np.fromiter((breed_codes.setdefault((row[1] or '').strip().lower(), len(breed_codes))
+                              for row in rows), dtype=np.int32, count=len(rows))
+        sizes = np.fromiter((size_codes.get(row[2], size_codes[models.Dog.UNKNOWN]) for row in rows),
+                            dtype=np.int32, count=len(rows))
+
+        # like ratio, smoothed so dogs with few ratings sit near the middle
+        popularity = np.full(len(rows), 0.5, dtype=np.float32)
+        counts = models.DogStats.objects.values_list('dog_id', 'likes', 'dislikes')
+        for dog_id, likes, dislikes in counts.iterator(chunk_size=5000):
+            row = np.searchsorted(ids, dog_id)
+            if row < len(ids) and ids[row] == dog_id:
+                popularity[row] = (likes + 1) / (likes + dislikes + 2)
+
+        return cls(version, ids, breeds, sizes, popularity)
+
+    def rows(self, dog_ids):
+        """Rows of the dogs, and a mask of the ones found."""
+
+        rows = np.searchsorted(self.ids, dog_ids)
+        rows = np.minimum(rows, max(len(self.ids) - 1, 0))
+        found = self.ids[rows] == dog_ids if len(self.ids) else np.zeros(len(dog_ids), dtype=bool)
+        return rows, found
+
+
+_candidates = None
+_candidates_lock = threading.Lock()
+
+
+def get_candidates():
+    """The candidates of the current dog version, reloaded now and then to refresh popularity."""
+
+    global _candidates
+
+    version = get_dog_version()
+    candidates = _candidates
+    if candidates is None or candidates.version != version or candidates.expires < time.monotonic():
+        with _candidates_lock:
+            candidates = _candidates
+            if candidates is None or candidates.version != version or candidates.expires < time.monotonic():
+                candidates = _candidates = Candidates.load(version)
+
+    return candidates
+
+
+class Ranker(ABC):
+    """Scores dogs for a user, higher scores are shown first."""
+
+    @abstractmethod
+    def scores(self, user_id, dog_ids):
+        """Return a float array with the score of every dog id in the array given."""
+
+    def update(self, user_id, statuses):
+        """Called after the user rated dogs, statuses is keyed by dog id."""
+
+    def forget(self, user_id):
+        """Drop anything kept about the user."""
+
+
+class AffinityRanker(Ranker):
+    """Ranks by the user's breed and size affinity, the dog's popularity and recency."""
+
+    def __init__(self):
+        self.weights = dict(DEFAULT_WEIGHTS, **getattr(settings, 'DOG_RANKING_WEIGHTS', {}))
+
+    def state_key(self, user_id):
+        return RANKER_STATE_KEY.format(version=get_dog_version(), user_id=user_id)
+
+    def get_state(self, user_id, candidates):
+        key = self.state_key(user_id)
+        state = cache.get(key)
+
+        if state is None or state['version'] != candidates.version:
+            state = {
+                'version': candidates.version,
+                'ratings': {},
+                'breed_sum': np.zeros(candidates.breed_count, dtype=np.float32),
+                'breed_count': np.zeros(candidates.breed_count, dtype=np.float32),
+                'size_sum': np.zeros(candidates.size_count, dtype=np.float32),
+                'size_count': np.zeros(candidates.size_count, dtype=np.float32),
+            }
+            ratings = models.UserDog.objects.filter(user_id=user_id, status__in=RATING_VALUES)
+            self.add_ratings(state, candidates, dict(ratings.values_list('dog_id', 'status')))
+            cache.set(key, state, getattr(settings, 'SWIPE_QUEUE_TIMEOUT', 300))
+
+        return state
+
+    def add_ratings(self, state, candidates, statuses):
+        """Replace the contribution of the dogs' previous ratings with the new ones."""
+
+        if not statuses:
+            return
+
+        ratings = state['ratings']
+        dog_ids = np.fromiter(statuses, dtype=np.int64, count=len(statuses))
+        old = np.array([RATING_VALUES.get(ratings.get(dog_id), 0.0) for dog_id in statuses], dtype=np.float32)
+        new = np.array([RATING_VALUES.get(status, 0.0) for status in statuses.values()], dtype=np.float32)
+        rows, found = candidates.rows(dog_ids)
+        rows, old, new = rows[found], old[found], new[found]
+
+        value_change = new - old
+        count_change = (new != 0).astype(np.float32) - (old != 0)
+        for name, codes in (('breed', candidates.breeds[rows]), ('size', candidates.sizes[rows])):
+            np.add.at(state[name + '_sum'], codes, value_change)
+            np.add.at(state[name + '_count'], codes, count_change)
+
+        for dog_id, status in statuses.items():
+            if status in RATING_VALUES:
+                ratings[dog_id] = status
+            else:
+                ratings.pop(dog_id, None)
+
+    def scores(self, user_id, dog_ids):
+        candidates = get_candidates()
+        if not len(candidates.ids):
+            return np.full(len(dog_ids), -np.inf)
+
+        state = self.get_state(user_id, candidates)
+        rows, found = candidates.rows(np.asarray(dog_ids, dtype=np.int64))
+
+        # one pseudo rating each way keeps a single like from dominating
+        breed_affinity = state['breed_sum'] / (state['breed_count'] + 2)
+        size_affinity = state['size_sum'] / (state['size_count'] + 2)
+
+        scores = (self.weights['affinity'] * (breed_affinity[candidates.breeds[rows]] +
+                                              size_affinity[candidates.sizes[rows]]) +
+                  self.weights['popularity'] * candidates.popularity[rows] +
+                  self.weights['recency'] * candidates.recency[rows])
+        # dogs added since the candidates were loaded go last until the next reload
+        scores[~found] = -np.inf
+
+        return scores
+
+    def update(self, user_id, statuses):
+        key = self.state_key(user_id)
+        state = cache.get(key)
+
+        # without a state it is rebuilt from the ratings in the database next time
+        if state is not None:
+            candidates = get_candidates()
+            if state['version'] == candidates.version:
+                self.add_ratings(state, candidates, statuses)
+                cache.set(key, state, getattr(settings, 'SWIPE_QUEUE_TIMEOUT', 300))
+
+    def forget(self, user_id):
+        cache.delete(self.state_key(user_id))
+
+
+@lru_cache(maxsize=None)
+def load_ranker(path):
+    return import_string(path)()
+
+
+def get_ranker():
+    return load_ranker(settings.DOG_RANKER)
+
+
+class RankedSwipeQueue(SwipeQueue):
+    """
+    A swipe queue in the order of the ranker's scores instead of by id.
+
+    Rated dogs stay in place, marked as rated, so "next after" a dog still works. After
+    every swipe the dogs after the one rated are scored again and reordered, while the
+    dogs the user already went past keep their place.
+    """
+
+    ranked = True
+
+    def __init__(self, user_id, ranker=None):
+        super(RankedSwipeQueue, self).__init__(user_id)
+        self.ranker = ranker or get_ranker()
+
+    @property
+    def key(self):
+        return RANKED_QUEUE_KEY.format(version=get_dog_version(), user_id=self.user_id)
+
+    def rank(self, dog_ids):
+        if not len(dog_ids):
+            return dog_ids
+
+        # stable, so dogs with the same score stay in id order
+        return dog_ids[np.argsort(-self.ranker.scores(self.user_id, dog_ids), kind='stable')]
+
+    def build(self):
+        order = self.rank(np.array(super(RankedSwipeQueue, self).build(), dtype=np.int64))
+
+        return {'order': order, 'rated': np.zeros(len(order), dtype=bool)}
+
+    def next_after(self, pk, count=1):
+        state = self.ids()
+        order, rated = state['order'], state['rated']
+
+        # dogs not in the queue, like the -1 of a new session, start from the top
+        position = np.flatnonzero(order == pk)
+        start = position[0] + 1 if len(position) else 0
+
+        return order[start:][~rated[start:]][:count].tolist()
+
+    def discard(self, *dog_ids):
+        key = self.key
+        state = cache.get(key)
+        if state is None:
+            return
+
+        order, rated = state['order'], state['rated']
+        positions = np.flatnonzero(np.isin(order, np.array(dog_ids, dtype=np.int64)))
+        if not len(positions):
+            return
+        rated[positions] = True
+
+        # the user hasn't seen the dogs after the ones rated yet, rank them with what was learned
+        tail = positions.max() + 1
+        unrated = ~rated[tail:]
+        order[tail:] = np.concatenate((self.rank(order[tail:][unrated]), order[tail:][~unrated]))
+        rated[tail:] = np.arange(len(unrated)) >= unrated.sum()
+
+        cache.set(key, state, getattr(settings, 'SWIPE_QUEUE_TIMEOUT', 300))
+
+    def apply(self, statuses):
+        self.ranker.update(self.user_id, statuses)
+
+        if None in statuses.values():
+            # undecided dogs go back into the queue, so rebuild it
+            super(RankedSwipeQueue, self).invalidate()
+        else:
+            self.discard(*statuses)
+
+    def invalidate(self):
+        super(RankedSwipeQueue, self).invalidate()
+        self.ranker.forget(self.user_id)
@@ -0,0 +1,77 @@
+"""
+Sends reads to the read replicas in settings.DATABASE_REPLICAS and writes to the primary.
+
+A client that just rated a dog or changed their preferences reads from the primary for
+REPLICA_PIN_SECONDS afterwards, so replication lag never brings back a dog they rated.
+ReplicaPinMiddleware decides which database a request reads from through `use_primary`.
+The pins are kept in the default cache, which the pugorugh.E001 check requires to be shared
+when several processes serve the app, so every worker sees a pin set by any of them.
+"""
+from contextvars import ContextVar
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.authentication import get_authorization_header
+
+PRIMARY = 'default'
+
+use_primary = ContextVar('use_primary', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def token_key(request):
+    """The token a request authenticates with, or None."""
+
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return None
+
+
+def pin_key(key):
+    return 'pugorugh:pin-primary:%s' % key
+
+
+def pin(key):
+    """Read from the primary for the token's next requests."""
+
+    cache.set(pin_key(key), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(key):
+    return cache.get(pin_key(key), False)
+
+
+class ReplicaRouter:
+    # tokens are read right after logging in, before a replica may have them
+    primary_models = {'authtoken.token'}
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+
+        if not replicas or use_primary.get() or model._meta.label_lower in self.primary_models:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            # reads inside a transaction have to see its writes
+            return PRIMARY
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
@@ -1,26 +1,348 @@
+"""
+Import dogs from a shelter feed.
+
+The feed is a JSON array, newline delimited JSON or CSV file and is read incrementally,
+so it never has to fit in memory. Records are validated one at a time and written with
+bulk_create in batches, each batch in its own transaction. Records with an external id
+update the dog imported earlier with the same id instead of adding a new one. Invalid
+records, like lines and array items that aren't valid JSON, and records the database
+rejects are reported and skipped without stopping the import. The photo variants and
+BlurHash placeholders of the imported dogs are generated afterwards, in parallel.
+
+    python pugorugh/scripts/data_import.py feed.ndjson --batch-size 2000 --errors errors.ndjson
+"""
+import argparse
+import csv
 import json
 from os import environ
 from os import path
 import sys
+import time
 
 import django
 
 PROJ_DIR = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+DEFAULT_FILE = path.join(PROJ_DIR, 'pugorugh', 'static', 'dog_details.json')
+# characters a number can go on with
+NUMBER_CHARACTERS = frozenset('0123456789+-.eE')
+
+
+class InvalidRecord:
+    """A line or array item of the feed that isn't valid JSON, reported like an invalid record."""
+
+    def __init__(self, text, error):
+        self.text = text
+        self.error = error
+
+
+def find_item_end(buffer, position):
+    """The position of the , or ] ending the array item at position, or None if it goes on past the buffer."""
+
+    depth = 0
+    in_string = escaped = False
+    for index in range(position, len(buffer)):
+        character = buffer[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif character == '\\':
+                escaped = True
+            elif character == '"':
+                in_string = False
+        elif character == '"':
+            in_string = True
+        elif character in '[{':
+            depth += 1
+        elif character in ']}' and depth:
+            depth -= 1
+        elif character in ',]' and not depth:
+            return index
+
+    return None
+
+
+def iter_json_array(file, read_size=65536):
+    """
+    Yield the items of a JSON array one at a time without loading the whole array. Items
+    that aren't valid JSON are yielded as InvalidRecord, up to the , or ] after them.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+
+    while True:
+        chunk = file.read(read_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+        while True:
+            # skip whitespace and the separators between items
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+
+            if not started:
+                if position == len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise ValueError('Expected a JSON array.')
+                started = True
+                position += 1
+                continue
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                item_end = find_item_end(buffer, position)
+                if item_end is None:
+                    # the item continues in the next chunk
+                    if not chunk:
+                        raise
+                    break
+
+                yield InvalidRecord(buffer[position:item_end].strip(), exc.msg)
+                position = item_end
+                continue
+
+            # only a delimiter after the item shows it is complete, 1. could be the start of 1.5
+            delimiter = end
+            while delimiter < len(buffer) and buffer[delimiter] in ' \t\r\n':
+                delimiter += 1
+            number_goes_on = delimiter == end < len(buffer) and buffer[end] in NUMBER_CHARACTERS and \
+                isinstance(item, (int, float)) and not isinstance(item, bool)
+            if delimiter == len(buffer) or number_goes_on:
+                if not chunk:
+                    raise ValueError('Unexpected end of the JSON array.')
+                break
+            if buffer[delimiter] not in ',]':
+                item_end = find_item_end(buffer, position)
+                if item_end is None:
+                    if not chunk:
+                        raise ValueError('Unexpected end of the JSON array.')
+                    break
+
+                yield InvalidRecord(buffer[position:item_end].strip(),
+                                    'Expected , or ] after an item of the JSON array.')
+                position = item_end
+                continue
+
+            position = end
+            yield item
+
+        if not chunk:
+            raise ValueError('Unexpected end of the JSON array.')
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield InvalidRecord(line.strip(), str(exc))
+
+
+def iter_csv(file):
+    for row in csv.DictReader(file):
+        # empty cells are missing values
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+READERS = {
+    'json': iter_json_array,
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
+
+
+def guess_format(filepath):
+    extension = path.splitext(filepath)[1].lower().lstrip('.')
+    return {'jsonl': 'ndjson'}.get(extension, extension if extension in READERS else 'json')
+
+
+def write_batch(dogs):
+    """
+    Insert dogs, given as (dog, fields) pairs, updating the ones whose external id was
+    imported before. Only the fields the dog's record gave are updated, so fields the feed
+    leaves out, like the photo's placeholder, keep their values.
+    """
+
+    from django.db import transaction
+    from pugorugh import models
+
+    # a batch can't update the same row twice, the last record for an external id wins
+    keyed = {dog.external_id: (dog, fields) for dog, fields in dogs if dog.external_id}
+    unkeyed = [dog for dog, fields in dogs if not dog.external_id]
+
+    # an upsert updates the same fields of every row it writes
+    by_fields = {}
+    for dog, fields in keyed.values():
+        by_fields.setdefault(fields, []).append(dog)
+
+    with transaction.atomic():
+        for fields, keyed_dogs in by_fields.items():
+            models.Dog.objects.bulk_create(keyed_dogs, update_conflicts=True,
+                                           unique_fields=['external_id'], update_fields=sorted(fields))
+        if unkeyed:
+            models.Dog.objects.bulk_create(unkeyed)
+
 
+def save_batch(batch, on_error=None):
+    """
+    Write a batch of (index, record, dog, fields) tuples. When the database rejects it, the
+    records are written one at a time so only the bad ones are skipped and passed to
+    on_error(index, record, errors). Returns the number of dogs written.
+    """
 
-def load_data():
-    filepath = path.join(PROJ_DIR, 'pugorugh', 'static', 'dog_details.json')
-    
-    with open(filepath, 'r', encoding='utf-8') as file:
-        data = json.load(file)
+    from django.db import DatabaseError
 
-        serializer = DogSerializer(data=data, many=True)
-        if serializer.is_valid():
-            serializer.save()
+    # SQLite raises OverflowError for integers it can't store
+    write_errors = (DatabaseError, OverflowError)
+
+    try:
+        write_batch([(dog, fields) for index, record, dog, fields in batch])
+    except write_errors:
+        pass
+    else:
+        return len(batch)
+
+    written = 0
+    for index, record, dog, fields in batch:
+        # the ids of a rolled back insert don't exist
+        dog.pk = None
+        try:
+            write_batch([(dog, fields)])
+        except write_errors as exc:
+            if on_error is not None:
+                on_error(index, record, {'non_field_errors': [str(exc)]})
+        else:
+            written += 1
+
+    return written
+
+
+def import_dogs(records, batch_size=1000, key='external_id', on_error=None):
+    """
+    Validate and save dogs from an iterable of records.
+
+    `key` is the record field holding the shelter's id of the dog. Invalid records, and the
+    ones the database rejects, are passed to on_error(index, record, errors) and skipped.
+    Returns a dict of counts.
+    """
+
+    from rest_framework.exceptions import ValidationError
+    from rest_framework.serializers import as_serializer_error
+    from pugorugh import models
+    from pugorugh.cache import bump_dog_version
+    from pugorugh.serializers import DogImportSerializer
+
+    stats = {'records': 0, 'imported': 0, 'errors': 0}
+    batch = []
+    # one serializer validates every record, building its fields once instead of per record
+    serializer = DogImportSerializer()
+
+    for index, record in enumerate(records):
+        stats['records'] += 1
+
+        if isinstance(record, InvalidRecord):
+            stats['errors'] += 1
+            if on_error is not None:
+                on_error(index, record.text, {'non_field_errors': [record.error]})
+            continue
+
+        if isinstance(record, dict) and key != 'external_id' and key in record:
+            record = dict(record, external_id=record[key])
+
+        try:
+            validated_data = serializer.run_validation(record)
+        except ValidationError as exc:
+            stats['errors'] += 1
+            if on_error is not None:
+                on_error(index, record, as_serializer_error(exc))
+            continue
+
+        dog = models.Dog(**validated_data)
+        # bulk_create skips Dog.save, so fill in the derived fields here
+        dog.age_bucket = models.age_bucket(dog.age)
+        fields = frozenset(validated_data).union({'age_bucket'}).difference({'external_id'})
+        batch.append((index, record, dog, fields))
+
+        if len(batch) >= batch_size:
+            written = save_batch(batch, on_error)
+            stats['imported'] += written
+            stats['errors'] += len(batch) - written
+            batch = []
+
+    if batch:
+        written = save_batch(batch, on_error)
+        stats['imported'] += written
+        stats['errors'] += len(batch) - written
+
+    # bulk writes don't send post_save, so add the counters of new dogs and invalidate cached dogs by hand
+    if stats['imported']:
+        new_dog_ids = models.Dog.objects.filter(stats__isnull=True).values_list('id', flat=True)
+        models.DogStats.objects.bulk_create([models.DogStats(dog_id=dog_id) for dog_id in new_dog_ids],
+                                            batch_size=batch_size, ignore_conflicts=True)
+        bump_dog_version()
+
+    return stats
+
+
+def generate_placeholders():
+    """Generate the photo variants and placeholders of the dogs that have no placeholder yet."""
+
+    from pugorugh import images
+    from pugorugh import models
+
+    image_filenames = set(models.Dog.objects.filter(image_placeholder='').values_list('image_filename', flat=True))
+    started = time.perf_counter()
+    placeholders = images.generate_placeholders(sorted(image_filenames))
+
+    print('Generated the placeholders of %d photos in %.2fs.' % (len(placeholders), time.perf_counter() - started))
+
+
+def load_data(filepath=DEFAULT_FILE, file_format=None, batch_size=1000, key='external_id', errors_file=None,
+              placeholders=True):
+    reader = READERS[file_format or guess_format(filepath)]
+    newline = '' if reader is iter_csv else None
+
+    def report_error(index, record, errors):
+        if errors_file is not None:
+            errors_file.write(json.dumps({'index': index, 'record': record, 'errors': errors}) + '\n')
         else:
-            print(serializer.errors)
+            print('record %d: %s' % (index, json.dumps(errors)), file=sys.stderr)
 
-    print('load_data done.')
+    started = time.perf_counter()
+    with open(filepath, 'r', encoding='utf-8', newline=newline) as file:
+        stats = import_dogs(reader(file), batch_size=batch_size, key=key, on_error=report_error)
+    elapsed = time.perf_counter() - started
+
+    print('load_data done. %d records, %d imported, %d errors in %.2fs (%.0f records/s).' % (
+        stats['records'], stats['imported'], stats['errors'], elapsed, stats['records'] / elapsed if elapsed else 0))
+
+    if placeholders and stats['imported']:
+        generate_placeholders()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('--format', choices=sorted(READERS), help='guessed from the file extension by default')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--key', default='external_id', help='record field with the shelter id of the dog')
+    parser.add_argument('--errors', type=argparse.FileType('w', encoding='utf-8'),
+                        help='write invalid records to this file as newline delimited json')
+    parser.add_argument('--no-placeholders', action='store_true',
+                        help="don't generate the photo variants and placeholders of the imported dogs")
+    args = parser.parse_args()
+
+    load_data(args.file, args.format, args.batch_size, args.key, args.errors, not args.no_placeholders)
 
 
 if __name__ == '__main__':
@@ -28,13 +350,4 @@ if __name__ == '__main__':
     environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
     django.setup()
 
-    # Assuming your serializer is named DogSerializer
-    # has to be imported after django.setup()
-    try:
-
-        from pugorugh.serializers import DogSerializer
-    except ImportError:
-        raise ImportError('serializers.py must contain a properly '
-            'implemented DogSerializer class for this import to work.')
-
-    load_data()
\ No newline at end of file
+    main()
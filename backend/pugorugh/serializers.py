@@ -1,7 +1,16 @@
 from django.contrib.auth import get_user_model
 
+from django.db.models import Manager
 from rest_framework import serializers
+
+from . import images
 from . import models
+from .cache import dog_payloads
+from .metrics import serializer_timer
+
+
+# the largest id the AutoField primary keys hold
+MAX_ID = 2 ** 31 - 1
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -20,10 +29,42 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class DogListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        dogs = list(data.all() if isinstance(data, Manager) else data)
+
+        with serializer_timer():
+            return dog_payloads.get_many(dogs, self.child.serialize)
+
+
 class DogSerializer(serializers.ModelSerializer):
+    """Dogs rarely change, so their payloads are cached, see cache.DogPayloadCache."""
+
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = models.Dog
-        fields = '__all__'
+        exclude = ('age_bucket',)
+        list_serializer_class = DogListSerializer
+
+    def get_image_variants(self, instance):
+        return images.variant_urls(instance.image_filename)
+
+    def serialize(self, instance):
+        return super(DogSerializer, self).to_representation(instance)
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return dog_payloads.get_many([instance], self.serialize)[0]
+
+
+class DogImportSerializer(serializers.ModelSerializer):
+    """Validates dogs from a shelter feed, the importer handles duplicate external ids itself."""
+
+    class Meta:
+        model = models.Dog
+        exclude = ('id', 'age_bucket')
+        extra_kwargs = {'external_id': {'validators': []}}
 
 
 class UserPrefSerializer(serializers.ModelSerializer):
@@ -48,3 +89,24 @@ class UserDogSerializer(serializers.ModelSerializer):
             'dog'
         )
         extra_kwargs = {'user': {'write_only': True}}
+
+
+class DogRatingSerializer(serializers.Serializer):
+    """A single swipe in a batch of ratings."""
+
+    dog = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+    status = serializers.ChoiceField(choices=('liked', 'disliked', 'undecided'))
+
+
+class DogIdsField(serializers.ListField):
+    """A list of dog ids, e.g. [1, 2, 3]."""
+
+    child = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+
+
+class DogStatsSerializer(serializers.ModelSerializer):
+    dog = DogSerializer(read_only=True)
+
+    class Meta:
+        model = models.DogStats
+        fields = ('dog', 'likes', 'dislikes', 'views')
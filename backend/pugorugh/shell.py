@@ -0,0 +1,99 @@
+"""
+The page of the single page app, index.html, rendered once per set of static files.
+
+The page only links the static files, so it changes when collectstatic gives them new
+hashed names and not between requests. It is rendered the first time it's asked for
+and kept as bytes, along with gzip and brotli copies and a strong ETag per encoding.
+In debug it is rendered on every request, so template edits show up right away.
+"""
+import gzip
+import hashlib
+import threading
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.utils.http import parse_etags
+
+TEMPLATE_NAME = 'index.html'
+
+
+def accepted_encodings(request):
+    """The content codings of the request's Accept-Encoding, without the refused ones."""
+
+    encodings = set()
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.partition(';')
+        _, _, quality = params.partition('=')
+        try:
+            refused = float(quality) == 0 if quality.strip() else False
+        except ValueError:
+            refused = False
+
+        if name.strip() and not refused:
+            encodings.add(name.strip().lower())
+
+    return encodings
+
+
+class Shell:
+    # preferred first
+    encodings = ('br', 'gzip')
+
+    def __init__(self, manifest_hash, content):
+        self.manifest_hash = manifest_hash
+        digest = hashlib.sha1(content).hexdigest()
+        self.bodies = {
+            None: (content, '"%s"' % digest),
+            'br': (brotli.compress(content), '"%s-br"' % digest),
+            'gzip': (gzip.compress(content, mtime=0), '"%s-gzip"' % digest),
+        }
+
+    @classmethod
+    def render(cls, manifest_hash):
+        # no request, the page has to be the same for everyone
+        return cls(manifest_hash, render_to_string(TEMPLATE_NAME).encode())
+
+    def response(self, request):
+        accepted = accepted_encodings(request)
+        encoding = next((encoding for encoding in self.encodings if encoding in accepted), None)
+        body, etag = self.bodies[encoding]
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='text/html; charset=utf-8')
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        # the page names the static files of the current deploy, so check it's still current
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+_shell = None
+_shell_lock = threading.Lock()
+
+
+def get_shell():
+    """The rendered page for the current static files."""
+
+    global _shell
+
+    manifest_hash = getattr(staticfiles_storage, 'manifest_hash', '')
+    if settings.DEBUG:
+        return Shell.render(manifest_hash)
+
+    shell = _shell
+    if shell is None or shell.manifest_hash != manifest_hash:
+        with _shell_lock:
+            shell = _shell
+            if shell is None or shell.manifest_hash != manifest_hash:
+                shell = _shell = Shell.render(manifest_hash)
+
+    return shell
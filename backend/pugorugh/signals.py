@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication
+from . import models
+from .cache import bump_dog_version
+from .queues import get_swipe_queue
+
+
+@receiver(post_save, sender=models.Dog)
+@receiver(post_delete, sender=models.Dog)
+def dog_changed(sender, instance, **kwargs):
+    bump_dog_version()
+    # and again once committed, in case another process cached the dogs before they were
+    transaction.on_commit(bump_dog_version)
+
+
+@receiver(post_save, sender=models.Dog)
+def dog_saved(sender, instance, created, **kwargs):
+    if created:
+        models.DogStats.objects.bulk_create([models.DogStats(dog=instance)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=models.UserPref)
+@receiver(post_delete, sender=models.UserPref)
+def user_pref_changed(sender, instance, **kwargs):
+    authentication.forget_user(instance.user_id)
+    queue = get_swipe_queue(instance.user_id)
+    queue.invalidate()
+    # another process may rebuild the queue from the old preferences until they are committed
+    transaction.on_commit(queue.invalidate)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.tokens.delete(instance.key)
+    authentication.forget_user(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    authentication.forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_handler(sender, request, user, **kwargs):
+    if user is not None:
+        authentication.forget_user(user.pk)
+
+
+@receiver(post_save, sender=models.UserDog)
+def user_dog_saved(sender, instance, created, **kwargs):
+    previous_status = None if created else getattr(instance, 'loaded_status', None)
+    models.DogStats.add({instance.dog_id: models.DogStats.rating_change(previous_status, instance.status)})
+    instance.loaded_status = instance.status
+
+    get_swipe_queue(instance.user_id).apply({instance.dog_id: instance.status})
+
+
+@receiver(post_delete, sender=models.UserDog)
+def user_dog_deleted(sender, instance, origin=None, **kwargs):
+    # the counters of a deleted dog are deleted with it
+    if getattr(origin, 'model', type(origin)) is not models.Dog:
+        models.DogStats.add({instance.dog_id: models.DogStats.rating_change(instance.status, None)})
+
+    get_swipe_queue(instance.user_id).invalidate()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute('PRAGMA %s = %s' % (pragma, value))
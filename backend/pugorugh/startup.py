@@ -0,0 +1,75 @@
+"""
+Worker startup: warming up the app before gunicorn forks, and profiling imports.
+
+With preload_app, gunicorn/prod.py calls warm_up in the master once the app is loaded, so
+what the first requests would load in every worker is loaded once and shared by the
+workers copy-on-write. Anything that reads the database closes its connection again,
+sockets must not be shared with the workers.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework.serializers import Serializer
+from rest_framework.settings import api_settings
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def warm_up():
+    """Load the url patterns, serializer fields, index page and dogs, and return the seconds it took."""
+
+    from . import serializers
+    from . import shell
+    from .catalog import get_catalog
+
+    started = time.perf_counter()
+
+    # resolving and reversing urls fill these on first use
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+
+    # the views' authentication, renderer and parser classes are imported on first use
+    for name in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_RENDERER_CLASSES',
+                 'DEFAULT_PARSER_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
+
+    # building the fields fills the model metadata caches they are built from
+    for serializer_class in vars(serializers).values():
+        if isinstance(serializer_class, type) and issubclass(serializer_class, Serializer) and \
+                serializer_class.__module__ == serializers.__name__:
+            serializer_class().fields
+
+    # the index page links hashed static files, so it needs collectstatic to have run
+    if getattr(staticfiles_storage, 'manifest_hash', '') and not settings.DEBUG:
+        shell.get_shell()
+
+    try:
+        # the dog catalog and the dogs ranked swipe queues score, loaded once for every worker
+        get_catalog()
+        if getattr(settings, 'DOG_RANKER', None):
+            from .ranking import get_candidates
+            get_candidates()
+    finally:
+        connections.close_all()
+
+    return time.perf_counter() - started
+
+
+def parse_import_times(output):
+    """
+    The modules in the output of python -X importtime, as (name, self, cumulative, depth)
+    tuples in microseconds, in import order: modules come before the ones importing them.
+    """
+
+    modules = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+
+    return modules
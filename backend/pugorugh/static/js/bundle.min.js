@@ -0,0 +1,19 @@
+var request=$;var TokenAuth={getAuthString(){return sessionStorage.getItem('authString');},setAuthString(authString){sessionStorage.setItem('authString',authString);},clearAuthString(){sessionStorage.removeItem('authString');},getAuthHeader(){return{Authorization:"Token "+this.getAuthString()};},getUsername(){var username=localStorage.getItem("username");if(username){return username;}
+return null;},setUsername(username){localStorage.setItem("username",username);},login(username,password,successCallback,failCallback){if(this.loggedIn()){successCallback();return;}
+request.post('/api/user/login/',{username:username,password:password}).done(function(data){this.setUsername(username);this.setAuthString(data.token);successCallback();}.bind(this)).fail(function(jqXHR,textStatus){this.clearAuthString();failCallback(textStatus);}.bind(this));},logout(callback){this.clearAuthString();callback();},loggedIn(){return!!this.getAuthString();},register(username,password,successCallback,failCallback){request.post('/api/user/',{username:username,password:password}).done(function(data){this.setUsername(username);successCallback();}.bind(this)).fail(function(jqXHR,textStatus){failCallback(jqXHR.responseText);});}};;
+var Registration=React.createClass({displayName:'Registration',mixins:[React.addons.LinkedStateMixin],getInitialState:function(){return{user:'',password:'',message:''};},handleRegistration:function(){TokenAuth.register(this.state.user,this.state.password,function(){TokenAuth.login(this.state.user,this.state.password,function(){this.props.setView("preferences");}.bind(this));}.bind(this),function(message){this.setState({message:message});}.bind(this));},disabled:function(){return this.state.user==''||this.state.password==''||this.state.password2==''||this.state.password!=this.state.password2;},render:function(){return React.createElement('div',null,React.createElement('p',{'class':'text-centered'},this.state.message),React.createElement('input',{type:'text',placeholder:'User',valueLink:this.linkState('user')}),React.createElement('input',{type:'password',placeholder:'Password',valueLink:this.linkState('password')}),React.createElement('input',{type:'password',placeholder:'Verify Password',valueLink:this.linkState('password2')}),React.createElement('button',{className:'button',onClick:this.handleRegistration,disabled:this.disabled()},'Register'));}});;
+var Login=React.createClass({displayName:'Login',mixins:[React.addons.LinkedStateMixin],getInitialState:function(){return{username:TokenAuth.getUsername(),password:'',message:''};},handleLogin:function(){TokenAuth.login(this.state.username,this.state.password,function(){this.props.setView("undecided");}.bind(this),function(message){if(error==400){this.setState({message:"Username or password are incorrect."});}else{this.setState({message:message});}}.bind(this));},disabled:function(){return this.state.username==''||this.state.password=='';},handleRegisterClick:function(event){this.props.setView("registration");},render:function(){return React.createElement('div',null,React.createElement('p',{'class':'text-centered'},this.state.message),React.createElement('input',{type:'text',placeholder:'User',valueLink:this.linkState('username')}),React.createElement('input',{type:'password',placeholder:'Password',valueLink:this.linkState('password')}),React.createElement('button',{onClick:this.handleLogin,disabled:this.disabled()},'Login'),React.createElement('a',{onClick:this.handleRegisterClick},'Register'));}});;
+var CheckboxGroup=React.createClass({displayName:'CheckboxGroup',title:React.PropTypes.node.isRequired,checkBoxes:React.PropTypes.arrayOf(function(propValue,key,componentName,location,propFullName){if(!key.hasOwnProperty('label')||!key.hasOwnProperty('value')){return new Error("'checkBoxes' items are missing properties for 'label' or 'value'");}}).isRequired,data:React.PropTypes.instanceOf(Set).isRequired,onChange:React.PropTypes.func.isRequired,atLeastOne:React.PropTypes.bool,getDefaultProps:function(){return{atLeastOne:false};},checkboxClicked:function(value,event){if(event.target.checked){this.props.data.add(value);}else{if(this.props.atLeastOne&&this.props.data.size<=1){return;}
+this.props.data.delete(value);}
+this.props.onChange(this.props.data);this.setState();},render:function(){return React.createElement('div',null,React.createElement('h5',null,this.props.title),this.props.checkboxes.map(function(p){return React.createElement('label',null,React.createElement('input',{type:'checkbox',checked:this.props.data.has(p.value),onChange:this.checkboxClicked.bind(this,p.value)}),React.createElement('span',{className:'label-body'},p.label));},this));}});;
+var Preferences=React.createClass({displayName:'Preferences',data:{age:new Set(['b','y','a','s']),gender:new Set(['m','f']),size:new Set(['s','m','l','xl'])},getInitialState:function(){return{data:this.data};},componentDidMount:function(){this.serverRequest=$.ajax({url:"api/user/preferences/",method:"GET",dataType:"json",headers:TokenAuth.getAuthHeader()}).done(function(data){this.data={age:new Set(data.age?data.age.split(","):['b','y','a','s']),gender:new Set(data.gender?data.gender.split(","):['m','f']),size:new Set(data.size?data.size.split(","):['s','m','l','xl'])};this.setState({data:this.data});}.bind(this));},componentWillUnmount:function(){this.serverRequest.abort();},handleCheckboxGroupDataChanged:function(property,data){this.data[property]=data;},save:function(){var json=JSON.stringify({age:Array.from(this.data.age).join(','),gender:Array.from(this.data.gender).join(','),size:Array.from(this.data.size).join(',')});$.ajax({url:"api/user/preferences/",method:"PUT",dataType:"json",headers:$.extend({'Content-type':'application/json'},TokenAuth.getAuthHeader()),data:json,success:this.props.setView.bind(this,'undecided')});},render:function(){return React.createElement('div',null,React.createElement('h4',null,'Set Preferences'),React.createElement(CheckboxGroup,{title:'Gender',checkboxes:[{label:"Male",value:"m"},{label:"Female",value:"f"}],data:this.state.data.gender,onChange:this.handleCheckboxGroupDataChanged.bind(this,'gender'),atLeastOne:true}),React.createElement(CheckboxGroup,{title:'Age',checkboxes:[{label:"Baby",value:"b"},{label:"Young",value:"y"},{label:"Adult",value:"a"},{label:"Senior",value:"s"}],data:this.state.data.age,onChange:this.handleCheckboxGroupDataChanged.bind(this,'age'),atLeastOne:true}),React.createElement(CheckboxGroup,{title:'Size',checkboxes:[{label:"Small",value:"s"},{label:"Medium",value:"m"},{label:"Large",value:"l"},{label:"Extra Large",value:"xl"}],data:this.state.data.size,onChange:this.handleCheckboxGroupDataChanged.bind(this,'size'),atLeastOne:true}),React.createElement('hr',null),React.createElement('button',{className:'button',onClick:this.save},'Save'));}});;
+var Dog=React.createClass({displayName:"Dog",batchSize:10,getInitialState:function(){return{filter:this.props.filter};},componentDidMount:function(){this.viewed=[];this.getFirst();},componentWillUnmount:function(){this.serverRequest.abort();this.sendViews();},componentWillReceiveProps:function(props){this.setState({details:undefined,message:undefined,filter:props.filter},this.getFirst);},getNext:function(){if(this.queue.length){this.showDog(this.queue.shift());return;}
+this.sendViews();if(!this.nextUrl){this.showEnd();return;}
+this.serverRequest=$.ajax({url:this.nextUrl,method:"GET",dataType:"json",headers:TokenAuth.getAuthHeader()}).done(function(data){this.queue=data.results;this.nextUrl=data.next;this.getNext();}.bind(this)).fail(function(response){this.setState({message:response.error,details:undefined});}.bind(this));},showDog:function(dog){this.viewed.push(dog.id);this.setState({details:dog,message:undefined});},showEnd:function(){var message=null;if(this.state.filter=="undecided"){message="No dogs matched your preferences.";}else{message=`You don't have any more ${ this.state.filter } dogs.`;}
+this.setState({message:message,details:undefined});},sendViews:function(){if(!this.viewed.length){return;}
+$.ajax({url:"api/dogs/views/",method:"POST",contentType:"application/json",data:JSON.stringify(this.viewed),headers:TokenAuth.getAuthHeader()});this.viewed=[];},changeDogStatus:function(newStatus){this.serverRequest=$.ajax({url:`api/dog/${ this.state.details.id }/${ newStatus }/`,method:"PUT",dataType:"json",headers:TokenAuth.getAuthHeader()}).done(function(data){this.getNext();}.bind(this)).fail(function(response){this.setState({message:response.error});}.bind(this));},getFirst:function(){this.queue=[];this.nextUrl=`api/dog/-1/${ this.state.filter }/next/?count=${ this.batchSize }`;this.getNext();},handlePreferencesClick:function(event){this.props.setView("preferences");},genderLookup:{m:'Male',f:'Female'},sizeLookup:{s:'Small',m:'Medium',l:'Large',xl:'Extra Large'},dogControls:function(){var like=React.createElement("a",{onClick:this.changeDogStatus.bind(this,'liked')},React.createElement("img",{src:"static/icons/liked.svg",height:"45px"}));var dislike=React.createElement("a",{onClick:this.changeDogStatus.bind(this,'disliked')},React.createElement("img",{src:"static/icons/disliked.svg",height:"45px"}));var undecide=React.createElement("a",{onClick:this.changeDogStatus.bind(this,'undecided')},React.createElement("img",{src:"static/icons/undecided.svg",height:"45px"}));var next=React.createElement("a",{onClick:this.getNext},React.createElement("img",{src:"static/icons/next.svg",height:"45px"}));switch(this.state.filter){case"liked":return React.createElement("p",{className:"text-centered dog-controls"},dislike,undecide,next);case"disliked":return React.createElement("p",{className:"text-centered dog-controls"},like,undecide,next);case"undecided":return React.createElement("p",{className:"text-centered dog-controls"},dislike,like,next);}},contents:function(){if(this.state.message!==undefined){return React.createElement("div",null,React.createElement("p",{className:"text-centered"},this.state.message));}
+if(this.state.details===undefined){return React.createElement("div",null,React.createElement("p",{className:"text-centered"},"Retrieving dog details..."));}
+if(!this.state.details){return React.createElement("div",null,React.createElement("p",{className:"text-centered"},"There are no more dogs to view. Please come back later."),React.createElement("p",{className:"text-centered"},React.createElement("a",{onClick:this.getFirst},"Start from beginning")));}
+return React.createElement("div",null,React.createElement("img",{src:this.state.details.image_variants.card}),React.createElement("p",{className:"dog-card"},this.state.details.name,"•",this.state.details.breed,"•",this.state.details.age," Months•",this.genderLookup[this.state.details.gender],"•",this.sizeLookup[this.state.details.size]),this.dogControls());},render:function(){return React.createElement("div",null,this.contents(),React.createElement("p",{className:"text-centered"},React.createElement("a",{onClick:this.handlePreferencesClick},"Set Preferences")));}});;
+var PugOrUgh=React.createClass({displayName:"PugOrUgh",getInitialState:function(){return{userName:TokenAuth.getUsername()};},componentWillMount:function(){this.setView(TokenAuth.loggedIn()?'undecided':"login");},setView:function(view){switch(view){case"liked":case"undecided":case"disliked":var component=React.createElement(Dog,{setView:this.setView,filter:view});break;case"preferences":var component=React.createElement(Preferences,{setView:this.setView});break;case"registration":var component=React.createElement(Registration,{setView:this.setView});break;case"login":var component=React.createElement(Login,{setView:this.setView});break;}
+this.setState({view:component,viewName:view});},handleLogoutClick:function(){TokenAuth.logout(function(){this.setView("login");}.bind(this));},hideLogout:function(){return this.state.viewName=="login";},render:function(){return React.createElement("div",null,React.createElement("header",{className:"circle--header"},React.createElement("div",{className:"bounds"},React.createElement("div",{className:"circle--fluid"},React.createElement("div",{className:"circle--fluid--cell circle--fluid--primary"},React.createElement("ul",{className:"circle--inline"},React.createElement("li",null,React.createElement("img",{src:"static/icons/logo.svg",height:"60px"}))),TokenAuth.loggedIn()?React.createElement("a",{onClick:this.handleLogoutClick,hidden:this.hideLogout()},"Logout ",TokenAuth.getUsername()):null),React.createElement("div",{className:"circle--fluid--cell circle--fluid--secondary"},React.createElement("nav",{disabled:this.state.view==""},React.createElement("ul",{className:"circle--inline"},React.createElement("li",{className:this.state.viewName=="liked"?"current-tab":""},React.createElement("a",{onClick:this.setView.bind(this,"liked")},"Liked")),React.createElement("li",{className:this.state.viewName=="undecided"?"current-tab":""},React.createElement("a",{onClick:this.setView.bind(this,"undecided")},"Undecided")),React.createElement("li",{className:this.state.viewName=="disliked"?"current-tab":""},React.createElement("a",{onClick:this.setView.bind(this,"disliked")},"Disliked")))))))),React.createElement("div",{className:"bounds"},React.createElement("div",{className:"grid-60 centered"},this.state.view)));}});ReactDOM.render(React.createElement(PugOrUgh,null),document.getElementById("container"));;
@@ -1,39 +1,73 @@
 var Dog = React.createClass({
+  // dogs fetched per request, then shown one at a time
+  batchSize: 10,
   getInitialState: function () {
     return {filter: this.props.filter};
   },
   componentDidMount: function() {
+    this.viewed = [];
     this.getFirst();
   },
   componentWillUnmount: function() {
     this.serverRequest.abort();
+    this.sendViews();
   },
   componentWillReceiveProps: function(props) {
-    this.setState({details: undefined, message: undefined, filter: props.filter}, this.getNext);
+    this.setState({details: undefined, message: undefined, filter: props.filter}, this.getFirst);
   },
   getNext: function () {
+    if (this.queue.length) {
+      this.showDog(this.queue.shift());
+      return;
+    }
+
+    this.sendViews();
+    if (!this.nextUrl) {
+      this.showEnd();
+      return;
+    }
+
     this.serverRequest = $.ajax({
-      url: `api/dog/${ this.state.details ? this.state.details.id : -1 }/${ this.state.filter }/next/`,
+      url: this.nextUrl,
       method: "GET",
       dataType: "json",
       headers: TokenAuth.getAuthHeader()
     }).done(function(data) {
-      this.setState({details: data, message: undefined});
+      this.queue = data.results;
+      this.nextUrl = data.next;
+      this.getNext();
     }.bind(this))
       .fail(function (response) {
-        var message = null;
-        if (response.status == 404) {
-          if (this.state.filter == "undecided") {
-            message = "No dogs matched your preferences.";
-          } else {
-            message = `You don't have any more ${this.state.filter} dogs.`;
-          }
-        } else {
-          message = response.error;
-        }
-        this.setState({ message: message, details: undefined});
+        this.setState({ message: response.error, details: undefined});
     }.bind(this));
   },
+  showDog: function (dog) {
+    this.viewed.push(dog.id);
+    this.setState({details: dog, message: undefined});
+  },
+  showEnd: function () {
+    var message = null;
+    if (this.state.filter == "undecided") {
+      message = "No dogs matched your preferences.";
+    } else {
+      message = `You don't have any more ${this.state.filter} dogs.`;
+    }
+    this.setState({ message: message, details: undefined});
+  },
+  sendViews: function () {
+    // dogs fetched ahead only count as viewed once they were shown
+    if (!this.viewed.length) {
+      return;
+    }
+    $.ajax({
+      url: "api/dogs/views/",
+      method: "POST",
+      contentType: "application/json",
+      data: JSON.stringify(this.viewed),
+      headers: TokenAuth.getAuthHeader()
+    });
+    this.viewed = [];
+  },
   changeDogStatus: function (newStatus) {
     this.serverRequest = $.ajax({
       url: `api/dog/${ this.state.details.id }/${ newStatus }/`,
@@ -48,6 +82,8 @@ var Dog = React.createClass({
       }.bind(this));
   },
   getFirst: function() {
+    this.queue = [];
+    this.nextUrl = `api/dog/-1/${ this.state.filter }/next/?count=${ this.batchSize }`;
     this.getNext();
   },
   handlePreferencesClick: function(event) {
@@ -118,7 +154,7 @@ var Dog = React.createClass({
 
     return (
       <div>
-        <img src={"static/images/dogs/" + this.state.details.image_filename} />
+        <img src={this.state.details.image_variants.card} />
         <p className="dog-card">
           {this.state.details.name}&bull;
           {this.state.details.breed}&bull;
@@ -1,12 +1,52 @@
-from django.urls import reverse
+import contextlib
+import copy
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from django.urls import clear_url_caches, get_resolver, reverse
+from PIL import Image
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 from rest_framework.test import APIRequestFactory
 from rest_framework.test import APITestCase
+from rest_framework.test import APITransactionTestCase
 from rest_framework.test import force_authenticate
 
+from . import authentication
+from . import catalog
+from . import checks
+from . import images
+from . import metrics
 from . import models
+from . import queues
+from . import ranking
+from . import routers
 from . import serializers
+from . import shell
+from . import startup
 from . import views
+from .cache import DOG_VERSION_KEY, dog_payloads
+from .counters import dog_views
+from .management.commands.build_bundle import BUNDLE_SOURCES
+from .middleware import ApiFastPathMiddleware, MetricsMiddleware, ReplicaPinMiddleware
+from .scripts import data_import
+
+# pages linking static files render without collectstatic having run
+UNHASHED_STATIC_STORAGES = {'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
 
 
 class UserAPITests(APITestCase):
@@ -50,6 +90,75 @@ class UserAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_token_authentication_is_cached(self):
+        """
+        Ensure a known token needs no authentication queries and is forgotten once deleted.
+        """
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        self.client.get(reverse('preferences-user'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('preferences-user'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        token.delete()
+        response = self.client.get(reverse('preferences-user'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_cache_invalidated_by_other_processes(self):
+        """
+        Ensure a user changed by another process isn't served from this process's cache.
+        """
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.get(reverse('preferences-user'))
+
+        # another process changes the preferences and bumps the user's version in the shared cache
+        models.UserPref.objects.filter(user=self.user).update(size='l')
+        cache.incr(authentication.USER_VERSION_KEY.format(user_id=self.user.pk))
+        response = self.client.get(reverse('preferences-user'))
+
+        self.assertEqual(response.data['size'], 'l')
+
+        # and deactivates the user
+        models.User.objects.filter(pk=self.user.pk).update(is_active=False)
+        authentication.bump_user_version(self.user.pk)
+        response = self.client.get(reverse('preferences-user'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_api_fast_path(self):
+        """
+        Ensure token authenticated api requests skip the browser middleware, and other requests don't.
+        """
+
+        token = Token.objects.create(user=self.user)
+        browser = APIClient(enforce_csrf_checks=True)
+
+        response = self.client.get(reverse('preferences-user'), HTTP_AUTHORIZATION='Token ' + token.key)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.wsgi_request.api_fast_path)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertNotIn('X-Frame-Options', response)
+
+        with self.settings(STORAGES=UNHASHED_STATIC_STORAGES):
+            response = browser.get(reverse('admin:login'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.wsgi_request.api_fast_path)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+        response = browser.post(reverse('admin:login'), {'username': 'test', 'password': 'test'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_post_user_pref(self):
         """
         Ensure we can put new user data based on signed in user data.
@@ -75,6 +184,9 @@ class UserAPITests(APITestCase):
 
 class DogAPITests(APITestCase):
     def setUp(self):
+        cache.clear()
+        # write the views counted by earlier tests, before their dog ids are used again
+        dog_views.flush()
         self.factory = APIRequestFactory()
 
         self.user = models.User.objects.create(username='test', password='test')
@@ -110,11 +222,145 @@ class DogAPITests(APITestCase):
         force_authenticate(request, user=self.user)
 
         view = views.DogListView.as_view()
-        response = view(request)
+        with tempfile.TemporaryDirectory() as variant_root, self.settings(DOG_IMAGE_VARIANT_ROOT=variant_root):
+            response = view(request)
+
+            self.assertTrue(os.path.exists(os.path.join(variant_root, 'card', '2.jpg.webp')))
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(models.Dog.objects.count(), 2)
         self.assertEqual(models.Dog.objects.get(pk=2).name, 'Hank')
+        # the placeholder of the photo is generated along with its variants
+        self.assertEqual(response.data['image_placeholder'], models.Dog.objects.get(pk=2).image_placeholder)
+        self.assertEqual(len(response.data['image_placeholder']), 28)
+
+    def test_import_dogs(self):
+        """
+        Ensure the importer streams records in batches, updates dogs by external id and skips bad records.
+        """
+
+        feed = io.StringIO(json.dumps([
+            {'shelter_id': 'a1', 'name': 'Hank', 'image_filename': '2.jpg', 'age': 14, 'gender': 'm', 'size': 's'},
+            {'shelter_id': 'a2', 'name': 'Daisy', 'image_filename': '4.jpg', 'age': 3, 'gender': 'f', 'size': 'm'},
+            {'shelter_id': 'a3', 'name': 'Nope', 'age': 'old', 'gender': 'x', 'size': 's'},
+            {'name': 'Rex', 'image_filename': '5.jpg', 'age': 100, 'gender': 'm', 'size': 'l'},
+            {'shelter_id': 'a1', 'name': 'Hank Jr', 'image_filename': '2.jpg', 'age': 15, 'gender': 'm', 'size': 's'},
+        ]))
+        errors = []
+
+        stats = data_import.import_dogs(data_import.iter_json_array(feed, read_size=16), batch_size=2,
+                                        key='shelter_id', on_error=lambda *error: errors.append(error))
+
+        self.assertEqual(stats, {'records': 5, 'imported': 4, 'errors': 1})
+        self.assertEqual([error[0] for error in errors], [2])
+        self.assertEqual(models.Dog.objects.count(), 4)
+        self.assertEqual(models.Dog.objects.get(external_id='a1').name, 'Hank Jr')
+        self.assertEqual(models.Dog.objects.get(external_id='a2').age_bucket, 'b')
+
+        # then the placeholders of the imported dogs' photos are generated
+        with tempfile.TemporaryDirectory() as variant_root, self.settings(DOG_IMAGE_VARIANT_ROOT=variant_root), \
+                contextlib.redirect_stdout(io.StringIO()):
+            data_import.generate_placeholders()
+
+        self.assertEqual([len(placeholder) for placeholder in models.Dog.objects.values_list(
+            'image_placeholder', flat=True)], [28, 28, 28, 28])
+
+        # importing a dog again only updates the fields its record gives
+        models.Dog.objects.filter(external_id='a2').update(image_placeholder='LKO2?U%2T', medical_needs='Eye drops')
+        feed = io.StringIO(json.dumps([
+            {'shelter_id': 'a2', 'name': 'Daisy', 'image_filename': '4.jpg', 'age': 8, 'gender': 'f', 'size': 'm',
+             'medical_needs': ''},
+        ]))
+        data_import.import_dogs(data_import.iter_json_array(feed), key='shelter_id')
+        daisy = models.Dog.objects.get(external_id='a2')
+
+        self.assertEqual((daisy.age_bucket, daisy.medical_needs, daisy.image_placeholder), ('y', '', 'LKO2?U%2T'))
+
+        # a record the database rejects is reported and skipped, the rest of its batch is written
+        errors = []
+        feed = io.StringIO(json.dumps([
+            {'name': 'Bolt', 'image_filename': '6.jpg', 'age': 12, 'gender': 'm', 'size': 'm'},
+            {'name': 'Methuselah', 'image_filename': '7.jpg', 'age': 2 ** 70, 'gender': 'm', 'size': 'm'},
+            {'name': 'Luna', 'image_filename': '8.jpg', 'age': 5, 'gender': 'f', 'size': 's'},
+        ]))
+        stats = data_import.import_dogs(data_import.iter_json_array(feed), batch_size=3,
+                                        on_error=lambda *error: errors.append(error))
+
+        self.assertEqual(stats, {'records': 3, 'imported': 2, 'errors': 1})
+        self.assertEqual([error[0] for error in errors], [1])
+        self.assertEqual(models.Dog.objects.filter(name__in=['Bolt', 'Luna']).count(), 2)
+
+    def test_import_dogs_invalid_json(self):
+        """
+        Ensure lines that aren't valid JSON are reported and skipped, and the lines around them imported.
+        """
+
+        feed = io.StringIO('\n'.join([
+            json.dumps({'name': 'Hank', 'image_filename': '2.jpg', 'age': 14, 'gender': 'm', 'size': 's'}),
+            '{bad json',
+            json.dumps({'name': 'Daisy', 'image_filename': '4.jpg', 'age': 3, 'gender': 'f', 'size': 'm'}),
+            '[1, 2',
+        ]))
+        errors = []
+
+        stats = data_import.import_dogs(data_import.iter_ndjson(feed), batch_size=10,
+                                        on_error=lambda *error: errors.append(error))
+
+        self.assertEqual(stats, {'records': 4, 'imported': 2, 'errors': 2})
+        self.assertEqual([error[:2] for error in errors], [(1, '{bad json'), (3, '[1, 2')])
+        self.assertEqual(sorted(models.Dog.objects.exclude(pk=self.dog.pk).values_list('name', flat=True)),
+                         ['Daisy', 'Hank'])
+
+    def test_iter_json_array(self):
+        """
+        Ensure items split across reads, like numbers, are only decoded once they are complete.
+        """
+
+        feed = '[1.5, -2e3 ,{"name": "Hank"}, "Daisy", true, null]'
+
+        for read_size in (1, 2, 3, 7, 65536):
+            self.assertEqual(list(data_import.iter_json_array(io.StringIO(feed), read_size=read_size)),
+                             [1.5, -2000.0, {'name': 'Hank'}, 'Daisy', True, None])
+
+        for feed in ('[1.5', '[{"name": "Hank"', '{"name": "Hank"}'):
+            with self.assertRaises(ValueError):
+                list(data_import.iter_json_array(io.StringIO(feed), read_size=3))
+
+        # items that aren't valid JSON are yielded as invalid records, up to the , or ] after them
+        feed = '[{"name": "Hank"}, {bad, "json]"}, 1 2, nope, {"name": "Daisy"}]'
+        for read_size in (1, 5, 65536):
+            items = list(data_import.iter_json_array(io.StringIO(feed), read_size=read_size))
+            self.assertEqual([item.text if isinstance(item, data_import.InvalidRecord) else item for item in items],
+                             [{'name': 'Hank'}, '{bad, "json]"}', '1 2', 'nope', {'name': 'Daisy'}])
+
+    def test_get_dog_image_variant(self):
+        """
+        Ensure dog photo variants are generated on the first request and listed by the serializer.
+        """
+
+        variant_url = serializers.DogSerializer(self.dog).data['image_variants']['thumbnail']
+
+        with tempfile.TemporaryDirectory() as variant_root, self.settings(DOG_IMAGE_VARIANT_ROOT=variant_root):
+            response = self.client.get(variant_url)
+            image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertLessEqual(max(image.size), 200)
+            self.assertTrue(os.path.exists(os.path.join(variant_root, 'thumbnail', '3.jpg.webp')))
+
+        response = self.client.get(variant_url.replace('3.jpg', 'missing.jpg'))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_blurhash(self):
+        """
+        Ensure photo placeholders match the reference BlurHash encoder.
+        """
+
+        image = images.open_image(images.source_path('1.jpg'))
+
+        self.assertEqual(images.blurhash(image), 'LoI}x0_4?bWCx[WDe-bHxuj?M{V@')
 
     def test_delete_dog(self):
         """
@@ -153,7 +399,64 @@ class DogAPITests(APITestCase):
         serializer = serializers.DogSerializer(models.Dog.objects.all(), many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
+
+    def test_get_dog_list_pages(self):
+        """
+        Ensure the dog list is paginated by id with an opaque cursor.
+        """
+
+        second_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+
+        view = views.DogListView.as_view()
+
+        request = self.factory.get(reverse('dog-list'), {'page_size': 1})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([dog['id'] for dog in response.data['results']], [self.dog.id])
+
+        request = self.factory.get(response.data['next'])
+        force_authenticate(request, user=self.user)
+        response = view(request)
+
+        self.assertEqual([dog['id'] for dog in response.data['results']], [second_dog.id])
+        self.assertIsNone(response.data['next'])
+
+        # without ?page_size= pages hold DOG_LIST_PAGE_SIZE dogs
+        request = self.factory.get(reverse('dog-list'))
+        force_authenticate(request, user=self.user)
+        with self.settings(DOG_LIST_PAGE_SIZE=1):
+            response = view(request)
+
+        self.assertEqual([dog['id'] for dog in response.data['results']], [self.dog.id])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_stream_dog_list(self):
+        """
+        Ensure the whole dog list can be streamed as json or newline delimited json.
+        """
+
+        models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+        serializer = serializers.DogSerializer(models.Dog.objects.all(), many=True)
+        view = views.DogListView.as_view()
+
+        request = self.factory.get(reverse('dog-list'), {'stream': 'ndjson'})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(row) for row in rows], serializer.data)
+
+        request = self.factory.get(reverse('dog-list'), {'stream': 'json'})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), serializer.data)
 
     def test_get_dog_status_list(self):
         """
@@ -183,7 +486,33 @@ class DogAPITests(APITestCase):
         serializer = serializers.DogSerializer(models.Dog.objects.filter(userdog__status='l'), many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
+
+    def test_get_dog_status_list_per_user(self):
+        """
+        Ensure status lists only use the signed in user's ratings and never repeat a dog.
+        """
+
+        other_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+        for username in ('other', 'another'):
+            other_user = models.User.objects.create(username=username, password='test')
+            models.UserDog.objects.create(user=other_user, dog=self.dog, status='l')
+            models.UserDog.objects.create(user=other_user, dog=other_dog, status='l')
+
+        view = views.DogStatusListView.as_view()
+
+        request = self.factory.get(reverse('dog-status-list', kwargs={'status': 'liked'}))
+        force_authenticate(request, user=self.user)
+        response = view(request, status='liked')
+
+        self.assertEqual([dog['id'] for dog in response.data['results']], [self.dog.id])
+
+        request = self.factory.get(reverse('dog-status-list', kwargs={'status': 'undecided'}))
+        force_authenticate(request, user=self.user)
+        response = view(request, status='undecided')
+
+        self.assertEqual([dog['id'] for dog in response.data['results']], [other_dog.id])
 
     def test_get_dog_detail_next(self):
         """
@@ -215,6 +544,164 @@ class DogAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_get_dog_detail_next_count(self):
+        """
+        Ensure several next dogs can be fetched at once with a link to the ones after them.
+        """
+
+        models.UserPref.objects.create(user=self.user, gender='m,f', age='b,y,a,s', size='s,m,l,xl')
+        self.user_dog.delete()
+        dogs = [self.dog] + [
+            models.Dog.objects.create(name='Dog %d' % index, image_filename='1.jpg', age=30, gender='m', size='s')
+            for index in range(4)
+        ]
+        view = views.DogGetNextView.as_view()
+
+        request = self.factory.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}), {'count': 3})
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(3):
+            response = view(request, pk=-1, status='undecided')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([dog['id'] for dog in response.data['results']], [dog.id for dog in dogs[:3]])
+        self.assertEqual(response.data['cursor'], dogs[2].id)
+
+        request = self.factory.get(response.data['next'])
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(1):
+            response = view(request, pk=dogs[2].id, status='undecided')
+
+        self.assertEqual([dog['id'] for dog in response.data['results']], [dog.id for dog in dogs[3:]])
+        self.assertIsNone(response.data['next'])
+
+        request = self.factory.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}), {'count': 500})
+        force_authenticate(request, user=self.user)
+        response = view(request, pk=-1, status='undecided')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dog_catalog(self):
+        """
+        Ensure the dog catalog matches and lists the same dogs as the database, without querying them.
+        """
+
+        models.UserPref.objects.create(user=self.user, gender='m', age='b,y,a,s', size='s,m')
+        for index, (gender, size, behavioral_assessment) in enumerate([
+                ('m', 's', False), ('f', 's', False), ('m', 'l', False), ('m', 'm', True), ('m', 'm', False)]):
+            models.Dog.objects.create(name='Dog %d' % index, image_filename='1.jpg', age=30, gender=gender,
+                                      size=size, behavioral_assessment=behavioral_assessment)
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        next_url = reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}) + '?count=10'
+
+        def get_dogs():
+            cache.clear()
+            matches = [dog['name'] for dog in self.client.get(next_url).data['results']]
+            listed = [dog['name'] for dog in self.client.get(reverse('dog-list')).data['results']]
+            return matches, listed
+
+        matches, listed = get_dogs()
+        with self.settings(DOG_CATALOG=True):
+            self.assertEqual(get_dogs(), (matches, listed))
+            self.assertEqual(matches, ['Dog 0', 'Dog 4'])
+
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('dog-list'), {'page_size': 2})
+                response = self.client.get(response.data['next'])
+                self.client.get(next_url)
+
+            self.assertEqual([dog['name'] for dog in response.data['results']], ['Dog 1', 'Dog 2'])
+
+            response = self.client.get(response.data['previous'])
+
+            self.assertEqual([dog['name'] for dog in response.data['results']], ['Muffin', 'Dog 0'])
+
+            # deleting a dog bumps the dog version the catalog is loaded for
+            models.Dog.objects.get(name='Dog 1').delete()
+            response = self.client.get(reverse('dog-list'), {'stream': 'ndjson'})
+            names = [json.loads(line)['name'] for line in b''.join(response.streaming_content).splitlines()]
+
+            self.assertEqual(names, ['Muffin', 'Dog 0', 'Dog 2', 'Dog 3', 'Dog 4'])
+
+    def test_dog_catalog_reload(self):
+        """
+        Ensure the catalog reloads when another process bumps the dog version, and once it is too old.
+        """
+
+        with self.settings(DOG_CATALOG=True):
+            loaded = catalog.get_catalog()
+            self.assertIs(catalog.get_catalog(), loaded)
+
+            # another process changed the dog, bumping the version in the shared cache
+            models.Dog.objects.filter(pk=self.dog.pk).update(name='Biscuit')
+            cache.set(DOG_VERSION_KEY, loaded.version + 1, None)
+            reloaded = catalog.get_catalog()
+
+            self.assertEqual(reloaded.get([self.dog.pk])[0].name, 'Biscuit')
+
+            # changes that don't bump the version wait for the catalog to expire
+            models.Dog.objects.filter(pk=self.dog.pk).update(name='Rex')
+            self.assertIs(catalog.get_catalog(), reloaded)
+            with self.settings(DOG_CATALOG_MAX_AGE=0):
+                self.assertEqual(catalog.get_catalog().get([self.dog.pk])[0].name, 'Rex')
+
+    def test_get_dog_detail_next_etag(self):
+        """
+        Ensure a matching If-None-Match gets a 304 until the dog changes.
+        """
+
+        view = views.DogGetNextView.as_view()
+        url = reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'liked'})
+
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.user)
+        etag = view(request, pk=-1, status='liked')['ETag']
+
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = view(request, pk=-1, status='liked')
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.dog.name = 'Biscuit'
+        self.dog.save()
+
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = view(request, pk=-1, status='liked')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Biscuit')
+
+    def test_dog_payload_cache(self):
+        """
+        Ensure serialized dogs are cached and refreshed when a dog is saved.
+        """
+
+        serializers.DogSerializer(self.dog).data
+
+        # update() doesn't send post_save, so the cached payload is still served
+        models.Dog.objects.filter(pk=self.dog.pk).update(name='Stale')
+        dog = models.Dog.objects.get(pk=self.dog.pk)
+        self.assertEqual(serializers.DogSerializer(dog).data['name'], 'Muffin')
+
+        self.dog.name = 'Biscuit'
+        self.dog.save()
+        self.assertEqual(serializers.DogSerializer(self.dog).data['name'], 'Biscuit')
+
+        # another process bumping the dog version, or the payload expiring, refreshes it too
+        models.Dog.objects.filter(pk=self.dog.pk).update(name='Waffle')
+        cache.incr(DOG_VERSION_KEY)
+        dog = models.Dog.objects.get(pk=self.dog.pk)
+        self.assertEqual(serializers.DogSerializer(dog).data['name'], 'Waffle')
+
+        dog_payloads.clear()
+        with self.settings(DOG_PAYLOAD_CACHE_TIMEOUT=0):
+            serializers.DogSerializer(dog).data
+            models.Dog.objects.filter(pk=self.dog.pk).update(name='Pancake')
+            dog = models.Dog.objects.get(pk=self.dog.pk)
+            self.assertEqual(serializers.DogSerializer(dog).data['name'], 'Pancake')
+
     def test_get_dog_detail_next_bad_data(self):
         """
         Ensure we can get the correct status code with a bad status passed.
@@ -243,3 +730,606 @@ class DogAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(user_dog.status, 'd')
+
+    def test_put_dog_detail_new_dog(self):
+        """
+        Ensure rating a dog for the first time creates a single user dog.
+        """
+
+        new_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+
+        request = self.factory.put(reverse('dog-detail-custom', kwargs={'pk': new_dog.id, 'status': 'liked'}))
+        force_authenticate(request, user=self.user)
+
+        view = views.DogDetailUpdateView.as_view()
+        # the serializer looks up the user and the dog, then in a savepoint the row is added if missing,
+        # the previous status is read, a single upsert writes the status and a single update the dog's counters
+        with self.assertNumQueries(8):
+            response = view(request, pk=new_dog.id, status='liked')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(models.UserDog.objects.get(user=self.user, dog=new_dog).status, 'l')
+
+    def test_user_dog_unique(self):
+        """
+        Ensure the database rejects a second user dog for the same user and dog.
+        """
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                models.UserDog.objects.create(user=self.user, dog=self.dog, status='d')
+
+    def test_get_dog_detail_next_undecided(self):
+        """
+        Ensure undecided dogs match preferences and skip dogs the user already rated.
+        """
+
+        models.UserPref.objects.create(user=self.user, gender='f', age='a', size='l,xl')
+        rated_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+        models.UserDog.objects.create(user=self.user, dog=rated_dog, status='d')
+        models.Dog.objects.create(
+            name='Hank', image_filename='2.jpg', breed='French Bulldog', age=14, gender='m', size='s')
+        next_dog = models.Dog.objects.create(
+            name='Daisy', image_filename='4.jpg', breed='Great Dane', age=30, gender='f', size='xl')
+
+        other_user = models.User.objects.create(username='other', password='other')
+        models.UserDog.objects.create(user=other_user, dog=next_dog, status='l')
+
+        request = self.factory.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}))
+        force_authenticate(request, user=self.user)
+
+        view = views.DogGetNextView.as_view()
+        response = view(request, pk=-1, status='undecided')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, serializers.DogSerializer(next_dog).data)
+
+    def test_user_pref_masks(self):
+        """
+        Ensure preference strings are stored as bit masks and dogs get an age bucket.
+        """
+
+        user_pref = models.UserPref.objects.create(user=self.user, gender='m,f', age='b,s', size='xl')
+
+        self.assertEqual(user_pref.gender_mask, models.GENDER_BITS['m'] | models.GENDER_BITS['f'])
+        self.assertEqual(user_pref.genders, ['m', 'f'])
+        self.assertEqual(user_pref.age_buckets, ['b', 's'])
+        self.assertEqual(user_pref.sizes, ['xl'])
+        self.assertEqual(self.dog.age_bucket, 'a')
+
+    def test_swipe_queue_follows_ratings_and_preferences(self):
+        """
+        Ensure the swipe queue drops rated dogs and is rebuilt when preferences change.
+        """
+
+        user_pref = models.UserPref.objects.create(user=self.user, gender='f', age='a', size='l,xl')
+        other_dog = models.Dog.objects.create(
+            name='Daisy', image_filename='4.jpg', breed='Great Dane', age=30, gender='f', size='xl')
+        self.user_dog.status = None
+        self.user_dog.save()
+
+        queue = queues.SwipeQueue(self.user.id)
+        self.assertEqual(list(queue.ids()), [self.dog.id, other_dog.id])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(queue.next_after(self.dog.id), [other_dog.id])
+
+        models.UserDog.objects.create(user=self.user, dog=other_dog, status='l')
+        self.assertEqual(list(queue.ids()), [self.dog.id])
+
+        user_pref.size = 'l'
+        user_pref.save()
+        self.assertEqual(list(queue.ids()), [])
+
+    def test_ranked_swipe_queue(self):
+        """
+        Ensure a ranker orders the undecided dogs and learns from every swipe.
+        """
+
+        models.UserPref.objects.create(user=self.user, gender='m,f', age='b,y,a,s', size='s,m,l,xl')
+        poodle, boxer, other_poodle, other_boxer = [
+            models.Dog.objects.create(name=name, image_filename='1.jpg', breed=breed, age=24, gender='f', size='m')
+            for name, breed in (('Fifi', 'Poodle'), ('Rocky', 'Boxer'), ('Coco', 'Poodle'), ('Max', 'Boxer'))
+        ]
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        with self.settings(DOG_RANKER='pugorugh.ranking.AffinityRanker'):
+            response = self.client.get(
+                reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}) + '?count=4')
+            # the user liked a boxer, and newer dogs come first
+            self.assertEqual([dog['id'] for dog in response.data['results']],
+                             [other_boxer.id, boxer.id, other_poodle.id, poodle.id])
+
+            self.client.put(reverse('dog-detail-custom', kwargs={'pk': other_boxer.id, 'status': 'disliked'}))
+            queue = queues.get_swipe_queue(self.user.id)
+
+            # boxers are even now, the dogs after the one rated are ranked again
+            with self.assertNumQueries(0):
+                self.assertEqual(queue.next_after(other_boxer.id, 3), [other_poodle.id, boxer.id, poodle.id])
+            self.assertEqual(queue.next_after(boxer.id), [poodle.id])
+
+    def test_dog_stats(self):
+        """
+        Ensure the like, dislike and view counters follow the ratings and views of a dog.
+        """
+
+        other_user = models.User.objects.create(username='other', password='other')
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        def counters():
+            stats = models.DogStats.objects.get(dog=self.dog)
+            return stats.likes, stats.dislikes, stats.views
+
+        self.assertEqual(counters(), (1, 0, 0))
+
+        # a flip moves the rating from one counter to the other, rating again changes nothing
+        self.client.put(reverse('dog-detail-custom', kwargs={'pk': self.dog.id, 'status': 'disliked'}))
+        self.client.put(reverse('dog-detail-custom', kwargs={'pk': self.dog.id, 'status': 'disliked'}))
+        self.assertEqual(counters(), (0, 1, 0))
+
+        models.UserDog.set_statuses(other_user.id, {self.dog.id: models.UserDog.LIKED})
+        self.assertEqual(counters(), (1, 1, 0))
+
+        self.client.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'disliked'}))
+        dog_views.flush()
+        self.assertEqual(counters(), (1, 1, 1))
+
+        # dogs fetched ahead are counted once the client sends that it showed them
+        self.client.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'disliked'}), {'count': 10})
+        dog_views.flush()
+        self.assertEqual(counters(), (1, 1, 1))
+
+        response = self.client.post(reverse('dog-views'), [self.dog.id, self.dog.id], format='json')
+        dog_views.flush()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(counters(), (1, 1, 3))
+
+        for dog_ids in ({'dog': self.dog.id}, [10 ** 20], [0], [True], list(range(1, 502))):
+            response = self.client.post(reverse('dog-views'), dog_ids, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # a dog id the database rejects only loses its own views
+        dog_views.add([self.dog.id, 10 ** 20])
+        dog_views.flush()
+        self.assertEqual(counters(), (1, 1, 4))
+
+        models.UserDog.objects.get(user=self.user).delete()
+        self.assertEqual(counters(), (1, 0, 4))
+
+        models.DogStats.objects.update(likes=10, dislikes=10)
+        call_command('rebuild_dog_stats', stdout=io.StringIO())
+        self.assertEqual(counters(), (1, 0, 4))
+
+    def test_get_dog_popular_list(self):
+        """
+        Ensure the most liked dogs come first with their counters.
+        """
+
+        new_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+        for username in ('other', 'another'):
+            other_user = models.User.objects.create(username=username, password='test')
+            models.UserDog.set_statuses(other_user.id, {new_dog.id: models.UserDog.LIKED})
+
+        request = self.factory.get(reverse('dog-popular-list'), {'count': 1})
+        force_authenticate(request, user=self.user)
+        response = views.DogPopularListView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['dog']['id'], new_dog.id)
+        self.assertEqual((response.data[0]['likes'], response.data[0]['dislikes']), (2, 0))
+
+    def test_post_dog_ratings(self):
+        """
+        Ensure a batch of ratings is applied with per item results.
+        """
+
+        new_dog = models.Dog.objects.create(
+            name='Francesca', image_filename='1.jpg', breed='Labrador', age=72, gender='f', size='l')
+        ratings = [
+            {'dog': self.dog.id, 'status': 'disliked'},
+            {'dog': new_dog.id, 'status': 'liked'},
+            {'dog': 999, 'status': 'liked'},
+            {'dog': new_dog.id, 'status': 'bad'},
+            {'dog': 10 ** 20, 'status': 'liked'},
+        ]
+
+        request = self.factory.post(reverse('dog-ratings'), ratings, format='json')
+        force_authenticate(request, user=self.user)
+
+        view = views.DogRatingsView.as_view()
+        response = view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['applied'] for result in response.data['results']], [True, True, False, False, False])
+        self.assertIn('dog', response.data['results'][4]['errors'])
+        self.assertEqual(models.UserDog.objects.get(user=self.user, dog=self.dog).status, 'd')
+        self.assertEqual(models.UserDog.objects.get(user=self.user, dog=new_dog).status, 'l')
+        self.assertEqual(models.UserDog.objects.count(), 2)
+
+    async def test_async_swipe(self):
+        """
+        Ensure the async endpoints rate dogs and get the next one like the sync views.
+        """
+
+        token = await Token.objects.acreate(user=self.user)
+        headers = {'Authorization': 'Token ' + token.key}
+
+        response = await self.async_client.put(
+            reverse('async-dog-detail-custom', kwargs={'pk': self.dog.id, 'status': 'disliked'}), headers=headers)
+        user_dog = await models.UserDog.objects.aget(user=self.user, dog=self.dog)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_dog.status, 'd')
+
+        response = await self.async_client.get(
+            reverse('async-dog-detail-next', kwargs={'pk': -1, 'status': 'disliked'}), headers=headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['id'], self.dog.id)
+
+        response = await self.async_client.get(
+            reverse('async-dog-detail-next', kwargs={'pk': -1, 'status': 'liked'}))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_metrics(self):
+        """
+        Ensure requests are recorded per view and exposed in the Prometheus format.
+        """
+
+        metrics.registry.reset()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        with self.settings(METRICS_SERVER_TIMING=True):
+            response = self.client.get(reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'liked'}))
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pugorugh_request_duration_seconds_count{view="dog-detail-next",method="GET",status="200"} 1',
+                      body)
+        self.assertIn('pugorugh_db_queries_bucket{view="dog-detail-next",le="+Inf"} 1', body)
+
+    def test_sqlite_pragmas(self):
+        """
+        Ensure new SQLite connections are tuned for concurrent workers.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            database = dict(connections['default'].settings_dict, NAME=os.path.join(directory, 'test.sqlite3'))
+            new_connection = type(connections['default'])(database, alias='pragmas')
+            try:
+                with new_connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    # NORMAL
+                    self.assertEqual(cursor.fetchone()[0], 1)
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+            finally:
+                new_connection.close()
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    # not a TestCase, its transaction would send every read to the default database
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def test_replica_routing(self):
+        """
+        Ensure reads go to a replica, except during and shortly after the client's writes.
+        """
+
+        router = routers.ReplicaRouter()
+        read_from = []
+
+        def get_response(request):
+            read_from.append(router.db_for_read(models.Dog))
+            return HttpResponse(status=200)
+
+        middleware = ReplicaPinMiddleware(get_response)
+
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            self.assertEqual(router.db_for_read(models.Dog), 'replica')
+            self.assertEqual(router.db_for_read(Token), 'default')
+            self.assertEqual(router.db_for_write(models.Dog), 'default')
+            self.assertFalse(router.allow_migrate('replica', 'pugorugh'))
+
+            middleware(self.factory.get('/api/dogs/', HTTP_AUTHORIZATION='Token abc'))
+            middleware(self.factory.put('/api/dog/1/liked/', HTTP_AUTHORIZATION='Token abc'))
+            middleware(self.factory.get('/api/dogs/', HTTP_AUTHORIZATION='Token abc'))
+            middleware(self.factory.get('/api/dogs/', HTTP_AUTHORIZATION='Token xyz'))
+
+        self.assertEqual(read_from, ['replica', 'default', 'default', 'replica'])
+
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(router.db_for_read(models.Dog), 'default')
+
+    async def test_async_replica_routing(self):
+        """
+        Ensure async requests are routed like sync ones.
+        """
+
+        router = routers.ReplicaRouter()
+        read_from = []
+
+        async def get_response(request):
+            read_from.append(router.db_for_read(models.Dog))
+            return HttpResponse(status=200)
+
+        middleware = ReplicaPinMiddleware(get_response)
+
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            await middleware(self.factory.put('/api/async/dog/1/liked/', HTTP_AUTHORIZATION='Token abc'))
+            await middleware(self.factory.get('/api/async/dog/-1/liked/next/', HTTP_AUTHORIZATION='Token abc'))
+            await middleware(self.factory.get('/api/async/dog/-1/liked/next/', HTTP_AUTHORIZATION='Token xyz'))
+
+        self.assertEqual(read_from, ['default', 'default', 'replica'])
+
+
+class ReplicaDatabaseTests(APITransactionTestCase):
+    """
+    Routes the requests of a client between the test database and a SQLite replica copied
+    from it, which then lags behind as it never gets the writes made afterwards.
+    """
+
+    def setUp(self):
+        cache.clear()
+        dog_payloads.clear()
+        self.user = models.User.objects.create(username='test', password='test')
+        models.UserPref.objects.create(user=self.user, gender='m,f', age='b,y,a,s', size='s,m,l,xl')
+        self.dog = models.Dog.objects.create(name='Muffin', image_filename='3.jpg', age=24, gender='f', size='xl')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica_name = os.path.join(directory.name, 'replica.sqlite3')
+
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(replica_name)
+        connections['default'].connection.backup(replica)
+        replica.close()
+
+        connections.settings['replica'] = dict(copy.deepcopy(connections.settings['default']), NAME=replica_name)
+        self.addCleanup(self.remove_replica)
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def test_replica_reads_follow_writes(self):
+        """
+        Ensure writes go to the primary and the client's reads follow them there while pinned.
+        """
+
+        models.Dog.objects.filter(pk=self.dog.pk).update(name='Biscuit')
+        liked_url = reverse('dog-status-list', kwargs={'status': 'liked'})
+
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            # reads come from the replica, which missed the rename
+            response = self.client.get(reverse('dog-list'))
+            self.assertEqual([dog['name'] for dog in response.data['results']], ['Muffin'])
+
+            response = self.client.put(reverse('dog-detail-custom', kwargs={'pk': self.dog.pk, 'status': 'liked'}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(models.UserDog.objects.using('default').filter(user=self.user, status='l').exists())
+            self.assertFalse(models.UserDog.objects.using('replica').exists())
+
+            # the client is pinned to the primary after writing, so it sees the dog it liked
+            response = self.client.get(liked_url)
+            self.assertEqual([dog['id'] for dog in response.data['results']], [self.dog.pk])
+
+            # once the pin expires it reads from the lagging replica again
+            cache.delete(routers.pin_key(self.token.key))
+            response = self.client.get(liked_url)
+            self.assertEqual(response.data['results'], [])
+
+
+class AdaptationRecorder(BaseHandler):
+    """A request handler recording the middleware it has to adapt between sync and async."""
+
+    def __init__(self):
+        super().__init__()
+        self.adapted = []
+
+    def adapt_method_mode(self, is_async, method, method_is_async=None, debug=False, name=None):
+        if method_is_async is None:
+            method_is_async = iscoroutinefunction(method)
+        if is_async != method_is_async:
+            self.adapted.append(name or method)
+
+        return super().adapt_method_mode(is_async, method, method_is_async, debug, name)
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+
+    @override_settings(MIDDLEWARE=['pugorugh.middleware.MetricsMiddleware', 'pugorugh.middleware.ReplicaPinMiddleware'])
+    def test_async_middleware(self):
+        """
+        Ensure an async handler runs the middleware without a thread per request.
+        """
+
+        handler = AdaptationRecorder()
+        handler.load_middleware(is_async=True)
+
+        self.assertEqual(handler.adapted, [])
+
+    def test_asgi_middleware(self):
+        """
+        Ensure the ASGI handler runs the whole middleware stack without a thread per request.
+        """
+
+        middleware = [path for path in settings.MIDDLEWARE if path not in settings.WSGI_ONLY_MIDDLEWARE]
+        handler = AdaptationRecorder()
+        with self.settings(MIDDLEWARE=middleware):
+            handler.load_middleware(is_async=True)
+
+        self.assertEqual(handler.adapted, [])
+
+    async def test_async_api_fast_path(self):
+        """
+        Ensure async api requests skip the browser middleware, and other requests run it.
+        """
+
+        async def get_response(request):
+            return HttpResponse('dog')
+
+        middleware = ApiFastPathMiddleware(get_response)
+        factory = APIRequestFactory()
+
+        response = await middleware(factory.get('/api/dogs/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertNotIn('X-Frame-Options', response)
+
+        request = factory.get('/admin/')
+        response = await middleware(request)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertTrue(hasattr(request, 'session'))
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    async def test_async_metrics(self):
+        """
+        Ensure the metrics of async requests are recorded.
+        """
+
+        async def get_response(request):
+            return HttpResponse('dog')
+
+        middleware = MetricsMiddleware(get_response)
+        response = await middleware(APIRequestFactory().get('/'))
+
+        self.assertIn('db;dur=0.00;desc="0 queries"', response['Server-Timing'])
+
+
+class StaticFilesTests(SimpleTestCase):
+
+    def test_static_files(self):
+        """
+        Ensure collected static files are hashed, precompressed and cached for good.
+        """
+
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as static_root:
+            with open(os.path.join(source, 'app.js'), 'w') as file:
+                file.write('var dogs = [];\n' * 200)
+
+            with self.settings(STATICFILES_DIRS=[source], STATIC_ROOT=static_root,
+                               STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder']):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                url = static('app.js')
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+                partial = self.client.get(url, HTTP_RANGE='bytes=0-14')
+
+                self.assertRegex(url, r'^/static/app\.[0-9a-f]{12}\.js$')
+                self.assertTrue(os.path.exists(os.path.join(static_root, os.path.basename(url) + '.gz')))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response['Content-Encoding'], 'br')
+                self.assertIn('immutable', response['Cache-Control'])
+                self.assertEqual(partial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+                self.assertEqual(b''.join(partial.streaming_content), b'var dogs = [];\n')
+
+        response = self.client.get('/favicon.ico')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/x-icon')
+
+    def test_index(self):
+        """
+        Ensure the page is rendered once and served compressed, with an ETag.
+        """
+
+        with self.settings(STORAGES=UNHASHED_STATIC_STORAGES):
+            response = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            cached = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=response['ETag'],
+                                     HTTP_ACCEPT_ENCODING='gzip')
+
+            self.assertIs(shell.get_shell(), shell.get_shell())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn(b'/static/js/bundle.min.js', gzip.decompress(response.content))
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_build_bundle(self):
+        """
+        Ensure the scripts of the app are minified into one.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bundle.min.js')
+            call_command('build_bundle', output=output, stdout=io.StringIO())
+            with open(output) as file:
+                bundle = file.read()
+
+        static_root = os.path.join(os.path.dirname(__file__), 'static')
+        sources_size = sum(os.path.getsize(os.path.join(static_root, name)) for name in BUNDLE_SOURCES)
+
+        self.assertIn('var PugOrUgh=React.createClass', bundle)
+        self.assertLess(len(bundle), sources_size)
+
+
+class StartupTests(SimpleTestCase):
+    # not a TestCase, warming up closes the database connections
+    databases = {'default'}
+
+    def test_warm_up(self):
+        """
+        Ensure warming up loads the urls and the dogs ranked queues score.
+        """
+
+        clear_url_caches()
+        ranking._candidates = None
+        try:
+            with self.settings(DOG_RANKER='pugorugh.ranking.AffinityRanker'):
+                startup.warm_up()
+
+            self.assertTrue(get_resolver()._populated)
+            self.assertIsNotNone(ranking._candidates)
+        finally:
+            ranking._candidates = None
+
+    def test_parse_import_times(self):
+        """
+        Ensure the output of python -X importtime is read with the nesting of the imports.
+        """
+
+        output = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       120 |        120 |   pugorugh.cache\n'
+                  'import time:       300 |        420 | pugorugh.views\n')
+
+        self.assertEqual(startup.parse_import_times(output),
+                         [('pugorugh.cache', 120, 120, 1), ('pugorugh.views', 300, 420, 0)])
+
+
+class CheckTests(SimpleTestCase):
+    def test_shared_cache_check(self):
+        """
+        Ensure several processes can't run with a cache kept in each of them.
+        """
+
+        self.assertEqual(checks.check_shared_cache(None), [])
+
+        with self.settings(SERVER_PROCESSES=4):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['pugorugh.E001'])
+
+            with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://localhost:6379/0'}}):
+                self.assertEqual(checks.check_shared_cache(None), [])
+                self.assertEqual([error.id for error in checks.check_dog_payload_cache(None)], ['pugorugh.E002'])
+
+                with self.settings(DOG_PAYLOAD_CACHE_BACKEND='default'):
+                    self.assertEqual(checks.check_dog_payload_cache(None), [])
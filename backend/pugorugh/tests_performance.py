@@ -0,0 +1,177 @@
+import itertools
+import random
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from . import authentication
+from . import models
+from .cache import dog_payloads
+from .counters import dog_views
+
+
+class QueryCountTests(APITestCase):
+    """
+    Guards the number of queries of every endpoint.
+
+    Each endpoint is called on a small dataset and again after the dataset grew to
+    thousands of dogs and ratings. Both calls must stay within the endpoint's budget and
+    run the same number of queries, so an N+1 query or a new query on a hot path fails here.
+    Caches are cleared before every call, so the counts are the worst case.
+    """
+
+    # small and large dataset: dogs, other users and dogs rated by each of them
+    SMALL = (30, 3, 10)
+    LARGE = (2000, 40, 400)
+
+    def setUp(self):
+        random.seed(42)
+        self.user = models.User.objects.create(username='test', password='test')
+        self.user_pref = models.UserPref.objects.create(
+            user=self.user, gender='m,f', age='b,y,a,s', size='s,m,l,xl')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.dog_count = 0
+
+    def seed(self, dogs, users, ratings_per_user):
+        """Grow the dataset to the number of dogs, other users and ratings given."""
+
+        models.Dog.objects.bulk_create([
+            models.Dog(name='Dog %d' % index, image_filename='%d.jpg' % (index % 19 + 1), age=index % 200,
+                       age_bucket=models.age_bucket(index % 200), gender=random.choice('mf'),
+                       size=random.choice(('s', 'm', 'l', 'xl')))
+            for index in range(self.dog_count, dogs)
+        ])
+        self.dog_count = dogs
+        dog_ids = list(models.Dog.objects.values_list('id', flat=True))
+        models.DogStats.objects.bulk_create([models.DogStats(dog_id=dog_id) for dog_id in dog_ids],
+                                            ignore_conflicts=True)
+
+        new_users = models.User.objects.bulk_create([
+            models.User(username='user-%d-%d' % (dogs, index)) for index in range(users)])
+        models.UserDog.objects.bulk_create([
+            models.UserDog(user=user, dog_id=dog_id, status=random.choice('ld'))
+            for user in new_users + [self.user]
+            for dog_id in random.sample(dog_ids, ratings_per_user)
+        ], batch_size=5000, ignore_conflicts=True)
+
+    def count_queries(self, method, url, data=None):
+        cache.clear()
+        dog_payloads.clear()
+        authentication.tokens.clear()
+        authentication.user_prefs.clear()
+        dog_views.flush()
+
+        if callable(data):
+            data = data()
+
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+
+        self.assertLess(response.status_code, 400, response.content)
+        return len(context)
+
+    def assert_queries(self, budget, method, url, data=None):
+        """Call the endpoint on a small and a large dataset, checking the query counts."""
+
+        self.seed(*self.SMALL)
+        small = self.count_queries(method, url, data)
+        self.seed(*self.LARGE)
+        large = self.count_queries(method, url, data)
+
+        self.assertLessEqual(small, budget, '%s %s ran %d queries, the budget is %d' % (method, url, small, budget))
+        self.assertEqual(small, large, '%s %s ran %d queries on a small dataset but %d on a large one' % (
+            method, url, small, large))
+
+    def test_dog_next_undecided(self):
+        # token, preferences, swipe queue, dog
+        self.assert_queries(4, 'get', reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}))
+
+    def test_dog_next_undecided_batch(self):
+        url = reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}) + '?count=20'
+        self.assert_queries(4, 'get', url)
+
+    def test_dog_next_liked(self):
+        # token, dog
+        self.assert_queries(2, 'get', reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'liked'}))
+
+    def test_dog_status_list(self):
+        # token, page of dogs
+        self.assert_queries(2, 'get', reverse('dog-status-list', kwargs={'status': 'disliked'}))
+
+    def test_dog_status_list_undecided(self):
+        self.assert_queries(2, 'get', reverse('dog-status-list', kwargs={'status': 'undecided'}))
+
+    def test_dog_list(self):
+        self.assert_queries(2, 'get', reverse('dog-list'))
+
+    @override_settings(DOG_CATALOG=True)
+    def test_dog_next_undecided_catalog(self):
+        # token, preferences, loading the catalog, the user's ratings
+        self.assert_queries(4, 'get', reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'}))
+
+    @override_settings(DOG_CATALOG=True)
+    def test_dog_list_catalog(self):
+        # token, loading the catalog
+        self.assert_queries(2, 'get', reverse('dog-list'))
+
+    def test_dog_detail_update(self):
+        # token, user and dog validation, then in a savepoint the new rows, previous status, upsert and counters
+        self.assert_queries(8, 'put', reverse('dog-detail-custom', kwargs={'pk': 1, 'status': 'liked'}))
+
+    def test_dog_ratings(self):
+        # every call flips the ratings, so the counters change
+        statuses = itertools.cycle(('liked', 'disliked'))
+
+        def ratings():
+            status = next(statuses)
+            return [{'dog': pk, 'status': status} for pk in range(1, 21)]
+
+        # token, dog lookup, then in a savepoint the new rows, previous statuses, upsert and counters
+        self.assert_queries(8, 'post', reverse('dog-ratings'), ratings)
+
+    def test_dog_views(self):
+        # token, the views are written in batches
+        self.assert_queries(1, 'post', reverse('dog-views'), list(range(1, 21)))
+
+    def test_dog_popular_list(self):
+        # token, counters with their dogs
+        self.assert_queries(2, 'get', reverse('dog-popular-list') + '?count=50')
+
+    def test_user_pref(self):
+        # token, preferences
+        self.assert_queries(2, 'get', reverse('preferences-user'))
+
+    def test_user_pref_update(self):
+        preferences = {'gender': 'f', 'age': 'a', 'size': 'l', 'behavioral_assessment_required': False}
+        self.assert_queries(3, 'put', reverse('preferences-user'), preferences)
+
+    def test_warm_swipe(self):
+        """Once the caches are warm a swipe needs one query to get the dog and eight to rate it."""
+
+        self.seed(*self.LARGE)
+        dog_views.flush()
+        next_url = reverse('dog-detail-next', kwargs={'pk': -1, 'status': 'undecided'})
+        dog = self.client.get(next_url).data
+
+        with self.assertNumQueries(8):
+            response = self.client.put(reverse('dog-detail-custom', kwargs={'pk': dog['id'], 'status': 'liked'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(next_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['id'], dog['id'])
+
+        # the dog comes from memory with the catalog on
+        with self.settings(DOG_CATALOG=True):
+            self.client.get(next_url)
+            with self.assertNumQueries(0):
+                response = self.client.get(next_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,12 +1,12 @@
 from django.urls import path, re_path
-from django.views.generic import TemplateView
-from django.views.generic.base import RedirectView
 
 from rest_framework.urlpatterns import format_suffix_patterns
 from rest_framework.authtoken.views import obtain_auth_token
 
-from pugorugh.views import api_root, DogDetailDeleteView, DogDetailUpdateView, DogGetNextView, DogListView, \
-    DogStatusListView, UserRegisterView, UserPrefView
+from pugorugh import async_views
+from pugorugh.views import api_root, dog_image_variant, index, metrics_view, DogDetailDeleteView, \
+    DogDetailUpdateView, DogGetNextView, DogListView, DogPopularListView, DogRatingsView, DogStatusListView, \
+    DogViewsView, UserRegisterView, UserPrefView
 
 # API endpoints
 urlpatterns = format_suffix_patterns([
@@ -19,13 +19,19 @@ urlpatterns = format_suffix_patterns([
     re_path(r'^api/dog/(?P<pk>-?\d+)/(?P<status>[\w\-]+)/next/$', DogGetNextView.as_view(),
         name='dog-detail-next'),
     re_path(r'^api/dog/(?P<pk>\d+)/$', DogDetailDeleteView.as_view(), name='dog-detail-delete'),
+    # async versions of the swipe endpoints for ASGI workers
+    re_path(r'^api/async/dog/(?P<pk>\d+)/(?P<status>[\w\-]+)/$', async_views.dog_rate,
+        name='async-dog-detail-custom'),
+    re_path(r'^api/async/dog/(?P<pk>-?\d+)/(?P<status>[\w\-]+)/next/$', async_views.dog_next,
+        name='async-dog-detail-next'),
     path('api/dogs/', DogListView.as_view(), name='dog-list'),
+    path('api/dogs/ratings/', DogRatingsView.as_view(), name='dog-ratings'),
+    path('api/dogs/popular/', DogPopularListView.as_view(), name='dog-popular-list'),
+    path('api/dogs/views/', DogViewsView.as_view(), name='dog-views'),
     re_path(r'^api/dogs/(?P<status>[\w\-]+)/$', DogStatusListView.as_view(),
         name='dog-status-list'),
-    re_path(r'^favicon\.ico$',
-        RedirectView.as_view(
-            url='/static/icons/favicon.ico',
-            permanent=True
-        )),
-    path('', TemplateView.as_view(template_name='index.html'))
+    re_path(r'^media/dogs/(?P<variant>\w+)/(?P<image_filename>[\w\-.]+)\.webp$', dog_image_variant,
+        name='dog-image-variant'),
+    path('metrics', metrics_view, name='metrics'),
+    path('', index, name='index')
 ])
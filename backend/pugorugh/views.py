@@ -1,8 +1,12 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import Http404
+from django.db.models import Case, When
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.http import require_safe
 from rest_framework import permissions
 from rest_framework import status as drf_status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import api_view
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, ListCreateAPIView, RetrieveUpdateAPIView, RetrieveAPIView, \
@@ -13,8 +17,17 @@ from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 
+from . import images
+from . import metrics
 from . import models
+from . import queues
 from . import serializers
+from . import shell
+from .authentication import CachedTokenAuthentication, get_user_pref
+from .catalog import get_catalog
+from .counters import dog_views
+from .etags import DogETagMixin
+from .pagination import DogCursorPagination, StreamingListMixin
 
 
 @api_view(['GET'])
@@ -41,29 +54,77 @@ class DogDetailUpdateView(APIView):
         serializer = serializers.UserDogSerializer(
             data={'user': self.request.user.id, 'dog': pk, 'status': status_letter})
         if serializer.is_valid():
-            try:
-                user_dog = models.UserDog.objects.get(user=self.request.user.id, dog=pk)
-                user_dog.status = status_letter
-            except models.UserDog.DoesNotExist:
-                user_dog = models.UserDog.objects.create(**serializer.validated_data)
-            user_dog.save()
+            statuses = {serializer.validated_data['dog'].id: status_letter}
+            models.UserDog.set_statuses(self.request.user.id, statuses)
+            queues.get_swipe_queue(self.request.user.id).apply(statuses)
 
             return Response(serializer.data, status=drf_status.HTTP_200_OK)
         return Response(serializer.errors, status=drf_status.HTTP_400_BAD_REQUEST)
 
 
-class DogGetNextView(RetrieveAPIView):
+class DogRatingsView(APIView):
+    """
+    Rate a batch of dogs at once, e.g. [{"dog": 1, "status": "liked"}, ...].
+    Every item gets its own result so one bad item doesn't reject the whole batch.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    max_batch_size = 500
+
+    def post(self, request, format=None):
+        if not isinstance(request.data, list):
+            raise ValidationError('Expected a list of {"dog": <pk>, "status": <status>} items.')
+        if len(request.data) > self.max_batch_size:
+            raise ValidationError('At most %d ratings can be sent at once.' % self.max_batch_size)
+
+        status_letters = {choice[1].lower(): choice[0] for choice in models.UserDog.STATUS_CHOICES}
+        ratings = [serializers.DogRatingSerializer(data=item) for item in request.data]
+        dog_ids = [rating.validated_data['dog'] for rating in ratings if rating.is_valid()]
+        existing_dog_ids = set(models.Dog.objects.filter(id__in=dog_ids).values_list('id', flat=True))
+
+        # results are returned in the same order as the ratings were sent
+        results = []
+        statuses = {}
+        for rating in ratings:
+            if rating.errors:
+                item = rating.initial_data if isinstance(rating.initial_data, dict) else {}
+                results.append({'dog': item.get('dog'), 'status': item.get('status'),
+                                'applied': False, 'errors': rating.errors})
+            elif rating.validated_data['dog'] not in existing_dog_ids:
+                results.append({**rating.validated_data, 'applied': False,
+                                'errors': {'dog': ['Dog does not exist.']}})
+            else:
+                statuses[rating.validated_data['dog']] = status_letters.get(rating.validated_data['status'])
+                results.append({**rating.validated_data, 'applied': True})
+
+        if statuses:
+            models.UserDog.set_statuses(request.user.id, statuses)
+
+            # bulk upserts don't send post_save, so keep the swipe queue in step here
+            queues.get_swipe_queue(request.user.id).apply(statuses)
+
+        return Response({'results': results}, status=drf_status.HTTP_200_OK)
+
+
+class DogGetNextView(DogETagMixin, RetrieveAPIView):
     """
     Gets next dog that matches the status provided and is after the id provided.
     Ids can be negative, in which case we start with the first positive id.
+
+    With ?count=N the next N dogs are returned at once, along with the link to the ones after them.
+    Those aren't counted as viewed until the client shows them, see DogViewsView.
     """
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     serializer_class = serializers.DogSerializer
     queryset = models.Dog.objects.all()
 
+    max_count = 50
+
     @property
     def provided_status(self):
         status = None
@@ -82,69 +143,146 @@ class DogGetNextView(RetrieveAPIView):
 
         return status
 
+    @property
+    def count(self):
+        count = self.request.query_params.get('count', 1)
+
+        try:
+            count = int(count)
+        except ValueError:
+            count = 0
+
+        if not 1 <= count <= self.max_count:
+            raise ValidationError('Count must be a number from 1 to %d.' % self.max_count)
+
+        return count
+
     def get_queryset(self):
         """Return a queryset based on dog pk and the user dog's status."""
 
+        pk = int(self.kwargs.get('pk'))
+
         if not self.provided_status:
-            # only filter on preferences
-            # if dog hasn't been chosen are liked or disliked yet
+            # dogs that haven't been liked or disliked yet come from
+            # the user's precomputed queue of dogs matching their preferences
+            queue = queues.get_swipe_queue(self.request.user.id)
+            dog_ids = queue.next_after(pk, self.count)
 
-            user_pref = self.request.user.userpref_set.get()
+            catalog = get_catalog()
+            if catalog is not None:
+                # a list of the dogs in queue order
+                return catalog.get(dog_ids)
 
-            available_dogs = self.queryset.filter(
-                gender__in=user_pref.gender.split(","),
-                size__in=user_pref.size.split(","),
-                age__in=user_pref.ages_int_range,
-                behavioral_assessment=user_pref.behavioral_assessment_required,
-            )
+            queryset = self.queryset.filter(id__in=dog_ids)
 
-        else:
-            available_dogs = self.queryset
+            if queue.ranked and dog_ids:
+                # keep the ranker's order
+                return queryset.order_by(Case(*[When(id=dog_id, then=position)
+                                                for position, dog_id in enumerate(dog_ids)]))
+
+            return queryset.order_by('id')
 
-        return available_dogs.filter(id__gt=self.kwargs.get('pk'), userdog__status=self.provided_status)
+        return self.queryset.with_user_status(
+            self.request.user.id, self.provided_status).filter(id__gt=pk).order_by('id')
 
     def get_object(self):
         """Return the first dog in the queryset or a 404 if none is found."""
 
-        queryset = self.get_queryset()
-
-        if len(queryset) == 1:
-            dog = queryset[0]
-        else:
-            dog = self.get_queryset().first()
+        # a queryset or, with the dog catalog on, a list
+        dog = next(iter(self.get_queryset()[:1]), None)
 
         if not dog:
             raise Http404
 
+        dog_views.add([dog.id])
         return dog
 
+    def retrieve(self, request, *args, **kwargs):
+        if 'count' not in request.query_params:
+            return super(DogGetNextView, self).retrieve(request, *args, **kwargs)
+
+        count = self.count
+        dogs = list(self.get_queryset()[:count])
+
+        def get_response():
+            next_url = None
+            if len(dogs) == count:
+                next_url = request.build_absolute_uri(reverse('dog-detail-next', kwargs={
+                    'pk': dogs[-1].id, 'status': self.kwargs.get('status')}) + '?count=%d' % count)
+
+            return Response({
+                'results': self.get_serializer(dogs, many=True).data,
+                'cursor': dogs[-1].id if dogs else None,
+                'next': next_url,
+            })
+
+        return self.etag_response(dogs, get_response)
+
+
+class DogViewsView(APIView):
+    """
+    Count views of dogs the client fetched ahead and has shown since, e.g. [1, 2, 3].
+    A dog shown twice is sent twice.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    dog_ids_field = serializers.DogIdsField(max_length=500)
+
+    def post(self, request, format=None):
+        dog_views.add(self.dog_ids_field.run_validation(request.data))
+
+        return Response(status=drf_status.HTTP_204_NO_CONTENT)
+
 
 class DogDetailDeleteView(DestroyAPIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     serializer_class = serializers.DogSerializer
     queryset = models.Dog.objects.all()
 
 
-class DogListView(ListCreateAPIView):
+class DogListView(StreamingListMixin, DogETagMixin, ListCreateAPIView):
     """Allow creation and deletion of dogs on site."""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     queryset = models.Dog.objects.all()
     serializer_class = serializers.DogSerializer
+    pagination_class = DogCursorPagination
+
+    def get_queryset(self):
+        catalog = get_catalog()
+        if catalog is not None:
+            # pages and streams from memory
+            return catalog.all()
+
+        return super(DogListView, self).get_queryset()
+
+    def perform_create(self, serializer):
+        image_filename = serializer.validated_data['image_filename']
+        placeholder = serializer.validated_data.get('image_placeholder')
 
+        if not placeholder and os.path.isfile(images.source_path(image_filename)):
+            # generates the variants of the photo too, so its first requests are served right away
+            placeholder = images.process_image(image_filename, settings.DOG_IMAGE_ROOT,
+                                               settings.DOG_IMAGE_VARIANT_ROOT)
 
-class DogStatusListView(ListAPIView):
+        serializer.save(image_placeholder=placeholder or '')
+
+
+class DogStatusListView(StreamingListMixin, DogETagMixin, ListAPIView):
     """Show all dogs that are liked, unliked, or undecided."""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     serializer_class = serializers.DogSerializer
     queryset = models.Dog.objects.all()
+    pagination_class = DogCursorPagination
 
     def get_status(self):
         status = None
@@ -166,13 +304,38 @@ class DogStatusListView(ListAPIView):
     def get_queryset(self):
         """Return a queryset based on dog pk and the user dog's status."""
 
-        return self.queryset.filter(userdog__status=self.get_status())
+        return self.queryset.with_user_status(self.request.user.id, self.get_status())
+
+
+class DogPopularListView(ListAPIView):
+    """The ?count= (10 by default) most liked dogs with their like, dislike and view counts."""
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    serializer_class = serializers.DogStatsSerializer
+
+    max_count = 100
+
+    def get_queryset(self):
+        count = self.request.query_params.get('count', 10)
+
+        try:
+            count = int(count)
+        except ValueError:
+            count = 0
+
+        if not 1 <= count <= self.max_count:
+            raise ValidationError('Count must be a number from 1 to %d.' % self.max_count)
+
+        # read from the dogstats_likes_idx index, no counting
+        return models.DogStats.objects.select_related('dog').order_by('-likes', 'dog')[:count]
 
 
 class UserPrefView(RetrieveUpdateAPIView, CreateModelMixin):
     """Create, update, or view user preferences."""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     queryset = models.UserPref.objects.all()
@@ -182,10 +345,37 @@ class UserPrefView(RetrieveUpdateAPIView, CreateModelMixin):
 
     def get_object(self):
         user = self.request.user
+        user_pref = get_user_pref(user.id)
 
-        try:
-            user_pref = models.UserPref.objects.get(user_id=user.id)
-        except models.UserPref.DoesNotExist:
+        if user_pref is None:
             user_pref = models.UserPref.objects.create(user=user)
 
         return user_pref
+
+
+def dog_image_variant(request, variant, image_filename, format=None):
+    """Serve a resized variant of a dog photo, generating it on the first request."""
+
+    if variant not in images.VARIANTS or not os.path.isfile(images.source_path(image_filename)):
+        raise Http404
+
+    response = FileResponse(open(images.generate_variant(image_filename, variant), 'rb'),
+                            content_type='image/webp')
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+@require_safe
+def index(request, format=None):
+    """The page of the single page app, rendered once and served precompressed."""
+
+    return shell.get_shell().response(request)
+
+
+def metrics_view(request, format=None):
+    """Request metrics of this process in the Prometheus text format."""
+
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
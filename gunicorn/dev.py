@@ -4,8 +4,11 @@
 wsgi_app = "backend.wsgi:application"
 # The granularity of Error log outputs
 loglevel = "debug"
-# The number of worker processes for handling requests
-workers = 2
+# The number of worker processes for handling requests, one as the default cache is kept in
+# each process (several need a shared CACHE_URL, see gunicorn/prod.py)
+workers = 1
+# Turn on Django's debug mode, it is off by default
+raw_env = ["DJANGO_DEBUG=true"]
 # The socket to bind
 bind = "0.0.0.0:8001"
 # Restart workers when code changes (development only!)
@@ -0,0 +1,87 @@
+"""Gunicorn *production* config file
+
+Every setting can be overridden with a GUNICORN_* environment variable, e.g.
+GUNICORN_WORKERS=4 GUNICORN_WORKER_CLASS=sync gunicorn -c gunicorn/prod.py
+
+Several workers need a cache they share, set CACHE_URL to a redis server,
+e.g. CACHE_URL=redis://localhost:6379/0. Without one gunicorn refuses to start.
+"""
+import gc
+import multiprocessing
+import os
+
+
+def env(name, default, cast=str):
+    value = os.environ.get("GUNICORN_" + name)
+    return default if value is None else cast(value)
+
+
+# Run from the django project so the app can be imported from the repo root
+chdir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+# The socket to bind
+bind = env("BIND", "0.0.0.0:8000")
+# The number of worker processes for handling requests, the usual (2 x cores) + 1
+workers = env("WORKERS", multiprocessing.cpu_count() * 2 + 1, int)
+# Tell the app, its checks fail when several workers would each keep their own cache
+os.environ.setdefault("DJANGO_SERVER_PROCESSES", str(workers))
+# Threaded workers keep serving while a thread waits on the database,
+# use uvicorn.workers.UvicornWorker to serve the ASGI app and its async swipe endpoints
+worker_class = env("WORKER_CLASS", "gthread")
+# Django application path in pattern MODULE_NAME:VARIABLE_NAME
+wsgi_app = env("WSGI_APP", "backend.asgi:application" if "uvicorn" in worker_class.lower()
+               else "backend.wsgi:application")
+# The master loads the settings in on_starting, before the ASGI app could tell them it is one
+if wsgi_app.startswith("backend.asgi"):
+    os.environ.setdefault("DJANGO_ASGI", "true")
+# Threads per worker, only used by gthread workers
+threads = env("THREADS", 4, int)
+# Load the app before forking so workers share its memory copy-on-write
+preload_app = env("PRELOAD", "true").lower() in ("1", "true", "yes")
+# Recycle workers now and then, with jitter so they don't all restart together
+max_requests = env("MAX_REQUESTS", 2000, int)
+max_requests_jitter = env("MAX_REQUESTS_JITTER", 200, int)
+# Seconds to hold idle keep-alive connections open, keep it above the load balancer's
+keepalive = env("KEEPALIVE", 5, int)
+# Seconds before a silent worker is killed and restarted
+timeout = env("TIMEOUT", 30, int)
+graceful_timeout = env("GRACEFUL_TIMEOUT", 30, int)
+# Keep the worker heartbeat file in memory rather than on disk
+worker_tmp_dir = env("WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+# The granularity of Error log outputs
+loglevel = env("LOGLEVEL", "info")
+# Write access and error info to stdout/stderr, the process manager collects them
+accesslog = env("ACCESSLOG", "-")
+errorlog = env("ERRORLOG", "-")
+
+
+def on_starting(server):
+    """Refuse to start when the app's checks fail, e.g. several workers without a shared CACHE_URL."""
+    import django
+    from django.core.management import call_command
+    from django.core.management.base import SystemCheckError
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    django.setup()
+    try:
+        call_command("check")
+    except SystemCheckError as error:
+        # gunicorn prints a RuntimeError and exits
+        raise RuntimeError(error)
+
+
+def when_ready(server):
+    """Warm the preloaded app up before forking, so every worker shares it instead of loading it."""
+    if preload_app:
+        from pugorugh.startup import warm_up
+
+        server.log.info("Warmed up the app in %.1f ms", warm_up() * 1000)
+        # keep the garbage collector from touching, and so copying, the pages shared with the workers
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Without preloading every worker loads the app itself, so it warms up on its own."""
+    if not preload_app:
+        from pugorugh.startup import warm_up
+
+        warm_up()